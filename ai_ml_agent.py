@@ -1,34 +1,203 @@
+import os
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
-from textblob import TextBlob
-
-def run_aiml_models_on_file(csv_path):
-    df = pd.read_csv(csv_path)
-
-    # Normalize text
-    df['review_text'] = df['review_text'].fillna("").astype(str)
-
-    # Sentiment
-    df["sentiment"] = df["review_text"].apply(lambda x: TextBlob(x).sentiment.polarity)
-
-    # Keywords via TF-IDF
-    tfidf = TfidfVectorizer(max_features=100)
-    tfidf_matrix = tfidf.fit_transform(df["review_text"])
-    keywords = tfidf.get_feature_names_out()
-    df["top_keyword"] = [keywords[i.argmax()] if i.nnz else "" for i in tfidf_matrix]
-
-    # Clustering
-    km = KMeans(n_clusters=4, random_state=42)
-    df["cluster"] = km.fit_predict(tfidf_matrix)
-    score = silhouette_score(tfidf_matrix, df["cluster"])
-    print(f"[AL agent] Clustering done. Silhouette Score: {score}")
-
-    # Save output
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_path = f"ai_ml_output_{timestamp}.csv"
-    df.to_csv(output_path, index=False)
-    print(f"[AL agent] Output written to: {output_path}")
+import scipy.sparse as sp
+from review_dataset import iter_reviews, write_reviews, stage_path
+from sentiment_engine import SENTIMENT_ENGINE_VERSION, score_sentiment
+from review_index import index_reviews
+from review_trends import update_trends
+from run_metrics import stage, start_run, write_run_metrics
+from dedup import DEDUP_THRESHOLD, assign_canonical_ids, review_ids
+from term_matrix import save_term_matrix
+from feature_cache import feature_key, get_features, put_features
+from cluster_model import (
+    DEFAULT_N_CLUSTERS, SILHOUETTE_SAMPLE_SIZE, RANDOM_STATE, load_cluster_model, save_cluster_model,
+    fit_cluster_model, update_cluster_model, assign_clusters, evaluate_clustering,
+    term_counts, tfidf_from_counts,
+)
+
+# Reviews are analyzed this many at a time; peak memory follows this, not the size of the run
+ANALYSIS_CHUNK_SIZE = 50_000
+
+def _top_keywords(model, counts):
+    # Highest TF-IDF term per review under the current IDF, which every online update moves
+    tfidf_matrix = tfidf_from_counts(model, counts)
+    keywords = model["vectorizer"].get_feature_names_out()
+    best = np.asarray(tfidf_matrix.argmax(axis=1)).ravel()
+    return np.where(tfidf_matrix.getnnz(axis=1) > 0, keywords[best], "").tolist()
+
+def _compute_features(texts, model, sentiment_engine, use_cache):
+    # Sentiment and term counts per review, only cache misses are computed; the top
+    # keyword depends on the IDF, so it is derived from the counts on every run
+    version = f"{sentiment_engine}:{SENTIMENT_ENGINE_VERSION}:{model['vocabulary_id']}"
+    keys = [feature_key(t, version) for t in texts]
+    cached = get_features(keys) if use_cache else {}
+
+    miss_keys = list(dict.fromkeys(k for k in keys if k not in cached))
+    miss_texts = list({k: t for k, t in zip(keys, texts) if k not in cached}.values())
+    miss_counts = term_counts(model, miss_texts) if miss_texts else sp.csr_matrix((0, len(model["vectorizer"].idf_)))
+    if miss_texts:
+        miss_sentiment = score_sentiment(miss_texts, engine=sentiment_engine)
+        computed = {
+            k: (miss_sentiment[j], miss_counts.indices[miss_counts.indptr[j]:miss_counts.indptr[j + 1]],
+                miss_counts.data[miss_counts.indptr[j]:miss_counts.indptr[j + 1]])
+            for j, k in enumerate(miss_keys)
+        }
+        if use_cache:
+            put_features((k, *v) for k, v in computed.items())
+        cached.update(computed)
+    print(f"[AL agent] Feature cache: {len(texts) - len(miss_texts)} hits, {len(miss_texts)} computed")
+
+    rows = [cached[k] for k in keys]
+    sentiment = np.array([r[0] for r in rows], dtype=np.float32)
+    lengths = np.array([len(r[1]) for r in rows])
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+    indices = np.concatenate([r[1] for r in rows]) if rows else np.array([], dtype=np.int32)
+    data = np.concatenate([r[2] for r in rows]) if rows else np.array([], dtype=np.float32)
+    counts = sp.csr_matrix((data, indices, indptr), shape=(len(rows), len(model["vectorizer"].idf_)))
+    return sentiment, counts, _top_keywords(model, counts), miss_counts
+
+def _silhouette_sample(sample, tfidf_matrix, labels, sample_size, rng):
+    # Keeps the rows with the smallest random keys: a uniform sample over every
+    # chunk seen so far that never grows beyond sample_size
+    keys = rng.random(tfidf_matrix.shape[0])
+    if sample is not None:
+        keys = np.concatenate([sample[0], keys])
+        tfidf_matrix = sp.vstack([sample[1], tfidf_matrix]).tocsr()
+        labels = np.concatenate([sample[2], labels])
+    if sample_size and len(keys) > sample_size:
+        keep = np.argpartition(keys, sample_size)[:sample_size]
+        keys, tfidf_matrix, labels = keys[keep], tfidf_matrix[keep], labels[keep]
+    return keys, tfidf_matrix, labels
+
+def _read_chunks(chunks):
+    # Times reading each chunk apart from analyzing it
+    chunks = iter(chunks)
+    while True:
+        with stage("aiml.read") as s:
+            df = next(chunks, None)
+            s.rows_out = 0 if df is None else len(df)
+        if df is None:
+            return
+        yield df
+
+def _run_aiml_models(chunks, run_id, sentiment_engine="lexicon", n_clusters=None, refit=False,
+                     silhouette_sample_size=SILHOUETTE_SAMPLE_SIZE, random_state=RANDOM_STATE, use_cache=True,
+                     dedup_threshold=DEDUP_THRESHOLD):
+    # chunks: iterable of DataFrames; each is analyzed, written and indexed before
+    # the next one is read, so memory is bounded by the chunk size
+
+    # Persisted TF-IDF + clustering model: new reviews update it online, so
+    # cluster IDs stay stable; a refit renumbers clusters to match the old ones.
+    # n_clusters="auto" picks k by sampled silhouette when a model is (re)fitted;
+    # None keeps the persisted model's k (DEFAULT_N_CLUSTERS on the first fit), so
+    # only an explicitly requested k refits to a different cluster count.
+    model = load_cluster_model()
+    k_changed = model is not None and n_clusters not in (None, "auto") and model["n_clusters"] != n_clusters
+    needs_fit = model is None or refit or k_changed
+    if n_clusters is None:
+        n_clusters = model["n_clusters"] if model is not None else DEFAULT_N_CLUSTERS
+
+    rng = np.random.default_rng(random_state)
+    sample = None
+    total = added = 0
+    output_path = stage_path("analysis")
+    for part, df in enumerate(_read_chunks(chunks)):
+        if df.empty:
+            continue
+        # Normalize text
+        df['review_text'] = df['review_text'].fillna("").astype(str)
+        texts = df["review_text"].tolist()
+        # Rows of legacy CSVs without an ID get the review store's key, so the saved
+        # term matrix can be joined back to them
+        if "review_id" not in df.columns or df["review_id"].isna().any():
+            df["review_id"] = review_ids(df)
+
+        # Near-duplicates (copy-pasted complaints, the same review in several countries
+        # or runs) share a canonical_id; the dashboard counts either rows or canonical IDs
+        with stage("aiml.dedup", rows_in=len(df)) as s:
+            df["canonical_id"] = assign_canonical_ids(df, threshold=dedup_threshold)
+            s.rows_out = int(df["canonical_id"].nunique())
+
+        # A (re)fit uses the first chunk; later chunks update the model online
+        fitted = needs_fit
+        if needs_fit:
+            with stage("aiml.fit_model", rows_in=len(texts)):
+                model = fit_cluster_model(texts, n_clusters=n_clusters, previous=model,
+                                          sample_size=silhouette_sample_size, random_state=random_state)
+            print(f"[AL agent] Fitted cluster model v{model['version']} on {len(df)} reviews")
+            needs_fit = False
+
+        # Sentiment (batched lexicon scoring for English and Arabic; "textblob" for the old per-row path)
+        # and keywords via TF-IDF, served from the content-hash cache where possible
+        with stage("aiml.features", rows_in=len(texts)) as s:
+            sentiment, counts, top_keywords, new_counts = _compute_features(texts, model, sentiment_engine, use_cache)
+            # Rows actually computed; the rest came from the feature cache
+            s.rows_out = new_counts.shape[0]
+        df["sentiment"] = sentiment
+        df["top_keyword"] = top_keywords
+
+        # Only reviews the cache has not seen feed the online model update
+        if not fitted and new_counts.shape[0]:
+            with stage("aiml.update_model", rows_in=new_counts.shape[0]):
+                model = update_cluster_model(model, new_counts)
+            print(f"[AL agent] Updated cluster model to v{model['version']} with {new_counts.shape[0]} new reviews")
+
+        # Clustering
+        with stage("aiml.clustering", rows_in=len(df)) as s:
+            tfidf_matrix, clusters = assign_clusters(model, counts)
+            df["cluster"] = clusters
+            sample = _silhouette_sample(sample, tfidf_matrix, clusters, silhouette_sample_size, rng)
+            s.rows_out = len(clusters)
+
+        # Save output into the "analysis" dataset under the same run ID
+        with stage("aiml.write", rows_in=len(df)) as s:
+            output_path = write_reviews(df, "analysis", run_id=run_id, part=part)
+            s.rows_out = len(df)
+
+        # Term counts (unigrams + bigrams) next to the rows, memory-mapped by the dashboard and report
+        with stage("aiml.terms", rows_in=len(df)) as s:
+            s.rows_out = save_term_matrix(texts, df["review_id"].tolist(), f"{run_id}-{part}")
+
+        # Keep the dashboard's full-text search index in step with the analysis output
+        with stage("aiml.index", rows_in=len(df)) as s:
+            s.rows_out = index_reviews(df)
+            added += s.rows_out
+
+        # Daily / weekly trend buckets: only the ones this chunk's review dates fall in are rewritten
+        with stage("aiml.trends", rows_in=len(df)) as s:
+            s.rows_out = update_trends(df)
+        total += len(df)
+        print(f"[AL agent] Chunk {part + 1}: {len(df)} reviews analyzed ({total} so far)")
+
+    if not total:
+        print(f"[AL agent] No reviews to analyze for run {run_id}")
+        return output_path
+    with stage("aiml.save_model"):
+        save_cluster_model(model)
+
+    with stage("aiml.silhouette", rows_in=sample[1].shape[0]):
+        score = evaluate_clustering(sample[1], sample[2], sample_size=None, random_state=random_state)
+    if score is not None:
+        print(f"[AL agent] Clustering done. Silhouette Score: {score} (sample of {sample[1].shape[0]})")
+    else:
+        print("[AL agent] Clustering done. Too few reviews/clusters for a Silhouette Score.")
+
+    print(f"[AL agent] Output written to: {output_path} (run {run_id})")
+    print(f"[AL agent] Search index updated with {added} new reviews")
     return output_path
+
+def run_aiml_models_on_run(run_id, chunk_size=ANALYSIS_CHUNK_SIZE, **options):
+    # Streams one spider run back from the reviews dataset
+    chunks = iter_reviews("reviews", batch_size=chunk_size, run_id=run_id)
+    return _run_aiml_models(chunks, run_id, **options)
+
+def run_aiml_models_on_file(csv_path, chunk_size=ANALYSIS_CHUNK_SIZE, **options):
+    # Legacy entry point for CSV exports; a standalone run with its own metrics
+    chunks = pd.read_csv(csv_path, chunksize=chunk_size)
+    run_id = os.path.splitext(os.path.basename(csv_path))[0]
+    start_run(run_id)
+    try:
+        return _run_aiml_models(chunks, run_id, **options)
+    finally:
+        write_run_metrics(run_id)
@@ -0,0 +1,90 @@
+# corpus.py
+# Synthetic mixed English/Arabic bank-app reviews for the benchmark suite.
+# Reviews are stitched from topic x opinion phrases whose tone follows the
+# rating, so sentiment, TF-IDF, clustering and bigram stages see realistic text.
+import sys
+import numpy as np
+import pandas as pd
+
+EN_TOPICS = ["the app", "login", "the otp", "money transfer", "the update", "customer service", "the card",
+             "bill payment", "the branch", "face id", "the balance screen", "international transfer",
+             "the new design", "account opening", "the support team", "notifications"]
+EN_OPINIONS = {
+    "positive": ["is great", "works perfectly", "is very easy to use", "is fast and simple", "is excellent",
+                 "is really helpful", "is the best in oman", "is smooth now", "is amazing"],
+    "neutral": ["is okay", "is fine most of the time", "could be better", "needs some small changes",
+                "is average", "works sometimes"],
+    "negative": ["is very slow", "keeps crashing", "does not work", "is terrible", "never loads",
+                 "is the worst", "failed again", "is really bad", "is so frustrating"],
+}
+EN_EXTRAS = ["please fix it", "thank you", "five stars", "waste of time", "love it", "not happy",
+             "since the last update", "every single day", "well done", "i had to call the bank"]
+
+AR_TOPICS = ["التطبيق", "تسجيل الدخول", "رمز التحقق", "التحويل", "التحديث", "خدمة العملاء", "البطاقة",
+             "دفع الفواتير", "الفرع", "الواجهة الجديدة"]
+AR_OPINIONS = {
+    "positive": ["ممتاز", "رائع جدا", "سهل وسريع", "جميل", "أفضل تطبيق"],
+    "neutral": ["عادي", "مقبول", "يحتاج تحسين"],
+    "negative": ["سيء جدا", "بطيء", "لا يعمل", "فاشل", "مشكلة كبيرة"],
+}
+AR_EXTRAS = ["شكرا", "الله يوفقكم", "يرجى الإصلاح", "للأسف", "ما اشتغل"]
+
+# Store ratings lean towards the extremes
+RATING_WEIGHTS = np.array([0.22, 0.08, 0.12, 0.18, 0.40])
+# Review dates run back this many days from LATEST_REVIEW, newest first
+REVIEW_SPAN_DAYS = 730
+LATEST_REVIEW = pd.Timestamp("2025-06-30 23:59:59")
+
+def _tone(rating):
+    return "negative" if rating <= 2 else ("neutral" if rating == 3 else "positive")
+
+def _review(rng, rating, arabic):
+    topics, opinions, extras = (AR_TOPICS, AR_OPINIONS, AR_EXTRAS) if arabic else (EN_TOPICS, EN_OPINIONS, EN_EXTRAS)
+    tone = _tone(rating)
+    parts = []
+    for _ in range(rng.integers(1, 4)):
+        # Mostly on-tone, with some mixed feelings thrown in
+        phrase_tone = tone if rng.random() < 0.8 else ("neutral" if tone != "neutral" else "positive")
+        parts.append(f"{topics[rng.integers(len(topics))]} {opinions[phrase_tone][rng.integers(len(opinions[phrase_tone]))]}")
+    if rng.random() < 0.5:
+        parts.append(extras[rng.integers(len(extras))])
+    text = ". ".join(parts)
+    if not arabic and rng.random() < 0.15:
+        text += "!"
+    return text
+
+def generate_corpus(n_rows, arabic_share=0.3, n_banks=5, seed=42):
+    # DataFrame with the columns the spider writes to the reviews dataset
+    rng = np.random.default_rng(seed)
+    ratings = rng.choice(np.arange(1, 6), size=n_rows, p=RATING_WEIGHTS)
+    arabic = rng.random(n_rows) < arabic_share
+    banks = rng.integers(n_banks, size=n_rows)
+    google = rng.random(n_rows) < 0.6
+    source = np.where(google, "Google", "Apple")
+    app_ids = np.where(google, np.char.add("com.synthetic.bank", banks.astype(str)), (900000000 + banks).astype(str))
+    ids = np.arange(n_rows)
+    ages = np.sort(rng.integers(REVIEW_SPAN_DAYS * 86400, size=n_rows))
+    review_dates = (LATEST_REVIEW - pd.to_timedelta(ages, unit="s")).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    return pd.DataFrame({
+        "bank": np.char.add("Bank ", banks.astype(str)),
+        "source": source,
+        "app_id": app_ids,
+        "author": np.char.add("user", ids.astype(str)),
+        "title": "",
+        "review_text": [_review(rng, r, a) for r, a in zip(ratings.tolist(), arabic.tolist())],
+        "rating": ratings,
+        "review_id": [f"{s}:{a}:{i}" for s, a, i in zip(source, app_ids, ids.tolist())],
+        "review_date": review_dates,
+    })
+
+if __name__ == "__main__":
+    # python benchmarks/corpus.py <rows> <out.csv|out.parquet>
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    df = generate_corpus(n_rows)
+    if len(sys.argv) > 2:
+        out = sys.argv[2]
+        df.to_parquet(out, index=False) if out.endswith(".parquet") else df.to_csv(out, index=False)
+        print(f"Wrote {len(df)} synthetic reviews to {out}")
+    else:
+        print(df.head(10).to_string())
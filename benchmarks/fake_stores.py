@@ -0,0 +1,135 @@
+# fake_stores.py
+# Local stand-ins for the two review stores, fed from a synthetic corpus:
+#   AppleRSSServer   HTTP server speaking the customer-reviews RSS format fetch_apple_reviews reads
+#   FakeGooglePlay   drop-in for google_play_scraper.reviews, continuation tokens included
+import re
+import time
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from xml.sax.saxutils import escape
+from google_play_scraper import Sort
+from google_play_scraper.features.reviews import _ContinuationToken
+
+APPLE_PAGE_SIZE = 50
+APPLE_MAX_PAGES = 10
+
+_FEED_PATH = re.compile(r"^/(\w+)/rss/customerreviews/page=(\d+)/id=([^/]+)/sortby=mostrecent/xml$")
+
+def _entry(review_id, author, title, text, rating, updated):
+    return (
+        "<entry>"
+        f"<updated>{escape(updated)}</updated>"
+        f"<id>{escape(review_id)}</id>"
+        f"<title>{escape(title)}</title>"
+        f"<content type=\"text\">{escape(text)}</content>"
+        f"<im:rating>{int(rating)}</im:rating>"
+        f"<author><name>{escape(author)}</name></author>"
+        "</entry>"
+    )
+
+def _feed(entries):
+    return (
+        "<?xml version=\"1.0\" encoding=\"utf-8\"?>"
+        "<feed xmlns:im=\"http://itunes.apple.com/rss\" xmlns=\"http://www.w3.org/2005/Atom\" xml:lang=\"en\">"
+        + "".join(entries) + "</feed>"
+    ).encode("utf-8")
+
+class AppleRSSServer:
+    # Serves each app's Apple rows from the corpus, newest (first) row first, at most 10 pages of 50
+    def __init__(self, corpus, latency=0.0, host="127.0.0.1", port=0):
+        apple = corpus[corpus["source"] == "Apple"]
+        self.reviews = {app_id: rows[["review_id", "author", "title", "review_text", "rating", "review_date"]].values.tolist()
+                        for app_id, rows in apple.groupby("app_id", sort=False)}
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def page(self, app_id, page):
+        rows = self.reviews.get(app_id, [])
+        start = (page - 1) * APPLE_PAGE_SIZE
+        entries = [_entry(*row) for row in rows[start:start + APPLE_PAGE_SIZE]] if page <= APPLE_MAX_PAGES else []
+        if page == 1 and entries:
+            # The real feed opens with an app metadata entry
+            entries.insert(0, _entry(f"app-{app_id}", "", app_id, "", 0, rows[0][-1]))
+        return _feed(entries)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                match = _FEED_PATH.match(self.path)
+                if not match:
+                    self.send_error(404)
+                    return
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                body = server.page(match.group(3), int(match.group(2)))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/xml; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+class FakeGooglePlay:
+    # Call it like google_play_scraper.reviews; pages through each package's Google rows
+    def __init__(self, corpus, latency=0.0):
+        google = corpus[corpus["source"] == "Google"]
+        self.reviews = {app_id: rows[["review_id", "author", "review_text", "rating", "review_date"]].values.tolist()
+                        for app_id, rows in google.groupby("app_id", sort=False)}
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, app_id, lang="en", country="us", sort=Sort.NEWEST, count=100,
+                 filter_score_with=None, filter_device_with=None, continuation_token=None):
+        if continuation_token is not None:
+            if continuation_token.token is None:
+                return [], continuation_token
+            start, count = int(continuation_token.token), continuation_token.count
+            lang, country, sort = continuation_token.lang, continuation_token.country, continuation_token.sort
+        else:
+            start = 0
+            sort = sort.value if isinstance(sort, Sort) else sort
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        rows = self.reviews.get(app_id, [])
+        batch = rows[start:start + count]
+        # google_play_scraper hands out naive local datetimes
+        result = [
+            {"reviewId": review_id, "userName": author, "content": text, "score": int(rating),
+             "at": datetime.fromisoformat(date.replace("Z", "+00:00")).astimezone().replace(tzinfo=None)}
+            for review_id, author, text, rating, date in batch
+        ]
+        end = start + len(batch)
+        token = _ContinuationToken(str(end) if end < len(rows) else None, lang, country, sort, count,
+                                   filter_score_with, filter_device_with)
+        return result, token
@@ -0,0 +1,303 @@
+# run_benchmarks.py
+# Offline benchmark suite: scrape (against local store stand-ins), near-duplicate
+# detection, sentiment, TF-IDF, clustering, dashboard aggregation, the comparison
+# report and incremental trend updates on a synthetic corpus.
+# Reports rows/s and peak traced memory per stage and compares with a saved baseline.
+#
+#   python benchmarks/run_benchmarks.py --rows 1000 10000             # run, compare with baseline.json
+#   python benchmarks/run_benchmarks.py --rows 1000 10000 --save-baseline
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "tools"))
+sys.path.insert(0, BENCH_DIR)
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.feature_extraction.text import TfidfVectorizer
+import oryx_spider
+import crawl_scheduler
+from dedup import assign_canonical_ids
+from comparison_report import comparison_report, render_html
+from review_trends import update_trends, read_trends
+from cluster_model import MAX_FEATURES, DEFAULT_N_CLUSTERS, RANDOM_STATE, evaluate_clustering
+from sentiment_engine import score_sentiment
+from csat_cube import build_cube, select_cells, top_bigrams
+from corpus import generate_corpus
+from fake_stores import AppleRSSServer, FakeGooglePlay
+
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+STAGES = ["scrape", "dedup", "sentiment", "tfidf", "clustering", "dashboard", "report", "trends"]
+
+# Throughput drops / memory growth beyond this fraction of the baseline are flagged
+DEFAULT_TOLERANCE = 0.25
+
+@contextlib.contextmanager
+def _quiet():
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+@contextlib.contextmanager
+def _workdir():
+    # The pipeline writes under ./outputs; keep that in a throwaway directory
+    cwd = os.getcwd()
+    path = tempfile.mkdtemp(prefix="oryx-bench-")
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(path, ignore_errors=True)
+
+# ---------- Stages ----------
+# Each stage is (setup, run): setup(corpus, options) builds untimed inputs,
+# run(inputs) does the timed work and returns the number of rows processed.
+
+def setup_scrape(corpus, options):
+    banks = []
+    for bank, rows in corpus.groupby("bank", sort=True):
+        apps = rows.groupby("source")["app_id"].first()
+        banks.append(dict(bank_name=bank, apple_id=apps.get("Apple", "0"), google_package=apps.get("Google", "none"),
+                          max_reviews=len(rows)))
+    return corpus, banks, options.get("latency", 0.0)
+
+def run_scrape(inputs):
+    corpus, banks, latency = inputs
+    google = FakeGooglePlay(corpus, latency=latency)
+    real_url, real_gp = oryx_spider.APPLE_RSS_URL, oryx_spider.gp_reviews
+    with _workdir(), AppleRSSServer(corpus, latency=latency) as apple:
+        oryx_spider.APPLE_RSS_URL, oryx_spider.gp_reviews = apple.url, google
+        # Measure the pipeline, not the store rate limits
+        limits = dict(crawl_scheduler.HOST_RATE_LIMITS)
+        for host in (crawl_scheduler.host_of(apple.url), "play.google.com"):
+            crawl_scheduler.set_rate_limit(host, 1e9, 1e9)
+        try:
+            with _quiet():
+                results = oryx_spider.run_spider_on_banks(banks)
+        finally:
+            oryx_spider.APPLE_RSS_URL, oryx_spider.gp_reviews = real_url, real_gp
+            crawl_scheduler.HOST_RATE_LIMITS.clear()
+            crawl_scheduler.HOST_RATE_LIMITS.update(limits)
+            crawl_scheduler._buckets.clear()
+    return sum(sum(written.values()) for _, written in results)
+
+def setup_dedup(corpus, options):
+    return corpus[["review_id", "review_text"]]
+
+def run_dedup(frame):
+    # In memory only: the persistent LSH index would turn repeats into lookups
+    with _quiet():
+        return len(assign_canonical_ids(frame, db_path=None))
+
+def setup_texts(corpus, options):
+    return corpus["review_text"].tolist()
+
+def setup_sentiment(corpus, options):
+    # Builds the lexicon scorer up front so the timing covers scoring only
+    score_sentiment(["warm up"])
+    return setup_texts(corpus, options)
+
+def run_sentiment(texts):
+    return len(score_sentiment(texts))
+
+def run_tfidf(texts):
+    # Same vectorizer settings as fit_cluster_model
+    return TfidfVectorizer(max_features=MAX_FEATURES).fit_transform(texts).shape[0]
+
+def setup_clustering(corpus, options):
+    return TfidfVectorizer(max_features=MAX_FEATURES).fit_transform(corpus["review_text"])
+
+def run_clustering(tfidf_matrix):
+    # k-means fit + prediction and the sampled silhouette, as in fit_cluster_model / the AI/ML stage
+    labels = MiniBatchKMeans(n_clusters=DEFAULT_N_CLUSTERS, random_state=RANDOM_STATE, n_init=3).fit_predict(tfidf_matrix)
+    evaluate_clustering(tfidf_matrix, labels)
+    return tfidf_matrix.shape[0]
+
+def setup_dashboard(corpus, options):
+    # An analysis-shaped frame, prepared the way the dashboard loads it
+    with _quiet():
+        from csat_dashboard import _prep
+    scored = corpus.copy()
+    scored["sentiment"] = score_sentiment(scored["review_text"].tolist())
+    scored["cluster"] = scored.index % 4
+    with _quiet():
+        scored["canonical_id"] = assign_canonical_ids(scored, db_path=None)
+    return _prep(scored)
+
+def run_dashboard(prepped):
+    # Cube build plus the per-filter lookups the dashboard makes on every rerun
+    df, bank_col, text_col, sent_col, cluster_col, _, rating_col, src_col = prepped
+    cube = build_cube(df, bank_col, src_col, rating_col, cluster_col, sent_col, text_col, canonical_col="canonical_id")
+    banks, sources = sorted(df[bank_col].unique()), sorted(df[src_col].unique())
+    select_cells(cube, banks, sources, (1, 5))
+    select_cells(cube, banks, sources, (1, 5), deduplicated=True)
+    top_bigrams(cube, banks, sources, (1, 5))
+    for bank in banks:
+        top_bigrams(cube, [bank], sources, (1, 2))
+    return len(df)
+
+def setup_report(corpus, options):
+    scored = corpus.copy()
+    scored["sentiment"] = score_sentiment(scored["review_text"].tolist())
+    return scored
+
+def run_report(scored):
+    # Grouped distributions, bootstrap intervals, keyword log-odds and HTML rendering
+    render_html(comparison_report(scored, deduplicated=False))
+    return len(scored)
+
+# Share of the corpus folded into the trend buckets as the newest chunk
+TRENDS_NEW_SHARE = 0.1
+
+def setup_trends(corpus, options):
+    # Trend buckets holding the older 90% of the corpus; the run folds in the newest 10%
+    scored = setup_report(corpus, options)
+    scored["canonical_id"] = scored["review_id"]
+    n_new = max(1, int(len(scored) * TRENDS_NEW_SHARE))
+    # run_suite runs every stage inside its own _workdir, which is removed afterwards
+    db_path = os.path.abspath("review_trends.sqlite")
+    update_trends(scored.iloc[n_new:], db_path=db_path)
+    return scored.iloc[:n_new], db_path
+
+def run_trends(inputs):
+    # Incremental update (repeats replace the same contributions) plus the dashboard's reads
+    new_rows, db_path = inputs
+    update_trends(new_rows, db_path=db_path)
+    read_trends("day", db_path=db_path)
+    read_trends("week", deduplicated=True, db_path=db_path)
+    return len(new_rows)
+
+STAGE_FUNCTIONS = {
+    "scrape": (setup_scrape, run_scrape),
+    "dedup": (setup_dedup, run_dedup),
+    "sentiment": (setup_sentiment, run_sentiment),
+    "tfidf": (setup_texts, run_tfidf),
+    "clustering": (setup_clustering, run_clustering),
+    "dashboard": (setup_dashboard, run_dashboard),
+    "report": (setup_report, run_report),
+    "trends": (setup_trends, run_trends),
+}
+
+# ---------- Measurement ----------
+def measure(fn, inputs, repeat=1, memory=True):
+    # Best wall time over `repeat` runs, then one run under tracemalloc for the peak.
+    # tracemalloc sees Python and numpy allocations in this process, not worker processes.
+    seconds, rows = None, 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = fn(inputs)
+        elapsed = time.perf_counter() - start
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        try:
+            fn(inputs)
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "rows": int(rows),
+        "seconds": round(seconds, 4),
+        "rows_per_s": round(rows / seconds, 1) if seconds else None,
+        "peak_mb": round(peak_mb, 2) if peak_mb is not None else None,
+    }
+
+def run_suite(row_counts, stages=STAGES, repeat=1, memory=True, latency=0.0, arabic_share=0.3):
+    results = {}
+    for n_rows in row_counts:
+        print(f"\n[BENCH] 🧪 {n_rows:,} synthetic reviews")
+        corpus = generate_corpus(n_rows, arabic_share=arabic_share)
+        results[str(n_rows)] = {}
+        for stage in stages:
+            setup, run = STAGE_FUNCTIONS[stage]
+            with _workdir():
+                stats = measure(run, setup(corpus, {"latency": latency}), repeat=repeat, memory=memory)
+            results[str(n_rows)][stage] = stats
+            peak = f"{stats['peak_mb']:>9.1f} MB" if stats["peak_mb"] is not None else "        -"
+            print(f"[BENCH]   {stage:<11} {stats['rows']:>9,} rows  {stats['seconds']:>8.3f} s  "
+                  f"{stats['rows_per_s'] or 0:>12,.0f} rows/s  {peak}")
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    # Lists (rows, stage, metric, baseline, current, change) and whether it is a regression
+    rows = []
+    for n_rows, stages in report["results"].items():
+        for stage, stats in stages.items():
+            base = baseline.get("results", {}).get(n_rows, {}).get(stage)
+            if not base:
+                continue
+            for metric, worse_if_lower in (("rows_per_s", True), ("peak_mb", False)):
+                old, new = base.get(metric), stats.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old
+                regressed = change < -tolerance if worse_if_lower else change > tolerance
+                rows.append((n_rows, stage, metric, old, new, change, regressed))
+    return rows
+
+def print_comparison(rows, tolerance):
+    print(f"\n[BENCH] 📏 Against baseline (tolerance {tolerance:.0%})")
+    if not rows:
+        print("[BENCH]   Nothing in common with the baseline")
+        return
+    for n_rows, stage, metric, old, new, change, regressed in rows:
+        flag = "  ❌ REGRESSION" if regressed else ""
+        print(f"[BENCH]   {int(n_rows):>9,} {stage:<11} {metric:<10} {old:>12,.1f} -> {new:>12,.1f}  {change:+7.1%}{flag}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OrYx offline benchmark suite")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000], help="Corpus sizes (1k to 1M)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per stage; the best is kept")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of simulated latency per store request")
+    parser.add_argument("--arabic-share", type=float, default=0.3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--output", help="Also write this run's results as JSON")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on a regression")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.rows, args.stages, repeat=args.repeat, memory=not args.no_memory,
+                       latency=args.latency, arabic_share=args.arabic_share)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[BENCH] 💾 Results written to {args.output}")
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.tolerance)
+        print_comparison(rows, args.tolerance)
+        regressions = [r for r in rows if r[-1]]
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[BENCH] 📌 Baseline saved to {args.baseline}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
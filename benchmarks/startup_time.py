@@ -0,0 +1,73 @@
+# startup_time.py
+# Cold-start benchmark for the CLI: wall time of fresh interpreters running
+# `main.py --help`, every `main.py <command> --help` and the scrape import path,
+# plus the heavy modules each one pulls in.
+#
+#   python benchmarks/startup_time.py                         # best of 5, 1 s budget
+#   python benchmarks/startup_time.py --repeat 10 --fail-over-budget
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+MAIN = os.path.join(REPO_DIR, "main.py")
+
+COMMANDS = ["scrape", "analyze", "report", "dashboard", "run-all"]
+# Imports a scrape does before its first request
+SCRAPE_IMPORTS = "import main, oryx_spider, run_metrics, oryx_maistro"
+# Modules that should only load once a command actually needs them
+HEAVY_MODULES = ["pandas", "pyarrow", "sklearn", "scipy", "textblob", "streamlit", "langgraph"]
+
+DEFAULT_BUDGET = 1.0
+
+def _cases():
+    cases = [("main.py --help", [sys.executable, MAIN, "--help"])]
+    cases += [(f"main.py {c} --help", [sys.executable, MAIN, c, "--help"]) for c in COMMANDS]
+    cases.append(("scrape imports", [sys.executable, "-c", SCRAPE_IMPORTS]))
+    return cases
+
+def time_command(command, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def loaded_heavy_modules(code):
+    # Heavy top-level packages present in sys.modules after running `code`
+    probe = f"{code}\nimport sys\nprint(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", probe], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OrYx CLI startup benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command; the best is kept")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="Seconds each command may take")
+    parser.add_argument("--fail-over-budget", action="store_true", help="Exit with status 1 if any command is over budget")
+    args = parser.parse_args(argv)
+
+    print(f"[BENCH] ⏱️ CLI startup, best of {args.repeat} (budget {args.budget:.2f} s)")
+    over = []
+    baseline = time_command([sys.executable, "-c", "pass"], args.repeat)
+    print(f"[BENCH]   {'bare interpreter':<26} {baseline:>7.3f} s")
+    for name, command in _cases():
+        seconds = time_command(command, args.repeat)
+        flag = ""
+        if seconds > args.budget:
+            over.append(name)
+            flag = "  ❌ OVER BUDGET"
+        print(f"[BENCH]   {name:<26} {seconds:>7.3f} s{flag}")
+
+    heavy = loaded_heavy_modules(SCRAPE_IMPORTS)
+    print(f"[BENCH]   scrape path loads: {', '.join(heavy) if heavy else 'no heavy modules'}")
+
+    if over and args.fail_over_budget:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import os
+import joblib
+import hashlib
+import numpy as np
+from datetime import datetime
+from joblib import Parallel, delayed
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import normalize
+
+MODEL_DIR = os.path.join("outputs", "models")
+CLUSTER_MODEL_PATH = os.path.join(MODEL_DIR, "cluster_model.joblib")
+
+DEFAULT_N_CLUSTERS = 4
+MAX_FEATURES = 100
+RANDOM_STATE = 42
+
+# Silhouette is O(n^2): score a random sample of reviews instead of all of them
+SILHOUETTE_SAMPLE_SIZE = 5000
+# Cluster counts tried when n_clusters="auto"
+AUTO_K_RANGE = range(2, 9)
+
+# The persisted model is a dict:
+#   vectorizer  TfidfVectorizer with a fixed vocabulary; IDF is refreshed online
+#   kmeans      MiniBatchKMeans, updated with partial_fit on new reviews
+#   doc_freq / n_docs   running document frequencies behind the IDF
+#   version     bumped on every update
+#   vocabulary_id   fingerprint of the vocabulary, only changes on a refit
+
+def load_cluster_model(path=CLUSTER_MODEL_PATH):
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path)
+
+def save_cluster_model(model, path=CLUSTER_MODEL_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+def _refresh_idf(model):
+    # Same smoothed IDF as TfidfVectorizer, from running counts
+    n_docs, doc_freq = model["n_docs"], model["doc_freq"]
+    model["vectorizer"].idf_ = np.log((1 + n_docs) / (1 + doc_freq)) + 1
+
+def term_counts(model, texts):
+    # Raw term counts on the model vocabulary; stable across online IDF updates
+    return CountVectorizer.transform(model["vectorizer"], texts)
+
+def tfidf_from_counts(model, counts):
+    # Matches TfidfVectorizer.transform (smooth IDF, l2 norm) for the current IDF
+    return normalize(counts.multiply(model["vectorizer"].idf_).tocsr())
+
+def _term_centroids(model):
+    # Centroids as {term: weight} so models with different vocabularies can be compared
+    terms = model["vectorizer"].get_feature_names_out()
+    return [dict(zip(terms, center)) for center in model["kmeans"].cluster_centers_]
+
+def _align_clusters(previous, model):
+    # Renumber the new clusters so each keeps the ID of its closest previous centroid
+    old, new = _term_centroids(previous), _term_centroids(model)
+    terms = sorted(set().union(*old, *new))
+    old_m = np.array([[c.get(t, 0.0) for t in terms] for c in old])
+    new_m = np.array([[c.get(t, 0.0) for t in terms] for c in new])
+    old_m /= np.linalg.norm(old_m, axis=1, keepdims=True) + 1e-12
+    new_m /= np.linalg.norm(new_m, axis=1, keepdims=True) + 1e-12
+
+    # New cluster rows[i] takes the old ID cols[i]
+    rows, cols = linear_sum_assignment(-(new_m @ old_m.T))
+    order = np.empty(len(new), dtype=int)
+    order[cols] = rows
+
+    km = model["kmeans"]
+    km.cluster_centers_ = km.cluster_centers_[order]
+    if hasattr(km, "_counts"):
+        km._counts = km._counts[order]
+
+def evaluate_clustering(tfidf_matrix, labels, sample_size=SILHOUETTE_SAMPLE_SIZE, random_state=RANDOM_STATE):
+    # Sampled silhouette; None when the labels cannot define one
+    n_labels = len(set(labels))
+    if not 1 < n_labels < tfidf_matrix.shape[0]:
+        return None
+    sample_size = sample_size if sample_size and sample_size < tfidf_matrix.shape[0] else None
+    return float(silhouette_score(tfidf_matrix, labels, sample_size=sample_size, random_state=random_state))
+
+def _score_k(tfidf_matrix, k, sample_size, random_state):
+    labels = MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=3).fit_predict(tfidf_matrix)
+    return k, evaluate_clustering(tfidf_matrix, labels, sample_size, random_state)
+
+def select_n_clusters(tfidf_matrix, k_values=AUTO_K_RANGE, sample_size=SILHOUETTE_SAMPLE_SIZE, random_state=RANDOM_STATE, n_jobs=-1):
+    # Fits every candidate k in parallel and keeps the best sampled silhouette
+    k_values = [k for k in k_values if k < tfidf_matrix.shape[0]]
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_score_k)(tfidf_matrix, k, sample_size, random_state) for k in k_values
+    )
+    scores = {k: score for k, score in results if score is not None}
+    if not scores:
+        return DEFAULT_N_CLUSTERS, scores
+    return max(scores, key=scores.get), scores
+
+def fit_cluster_model(texts, n_clusters=DEFAULT_N_CLUSTERS, previous=None, sample_size=SILHOUETTE_SAMPLE_SIZE,
+                      random_state=RANDOM_STATE, k_values=AUTO_K_RANGE):
+    vectorizer = TfidfVectorizer(max_features=MAX_FEATURES)
+    tfidf_matrix = vectorizer.fit_transform(texts)
+
+    k_scores = {}
+    if n_clusters == "auto":
+        n_clusters, k_scores = select_n_clusters(tfidf_matrix, k_values, sample_size, random_state)
+        for k, score in sorted(k_scores.items()):
+            print(f"[AL agent]   k={k}: silhouette {score:.4f}{'  <- selected' if k == n_clusters else ''}")
+
+    if tfidf_matrix.shape[0] < n_clusters:
+        raise ValueError(f"Need at least {n_clusters} reviews to fit {n_clusters} clusters, got {tfidf_matrix.shape[0]}")
+
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, n_init=3)
+    kmeans.fit(tfidf_matrix)
+    model = {
+        "vectorizer": vectorizer,
+        "kmeans": kmeans,
+        "doc_freq": np.asarray((tfidf_matrix > 0).sum(axis=0)).ravel().astype(np.float64),
+        "n_docs": tfidf_matrix.shape[0],
+        "n_clusters": n_clusters,
+        "k_scores": k_scores,
+        "vocabulary_id": hashlib.sha1("\x1f".join(vectorizer.get_feature_names_out()).encode("utf-8")).hexdigest()[:12],
+        "version": (previous["version"] + 1) if previous else 1,
+        "fitted_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    if previous is not None and previous["n_clusters"] == n_clusters:
+        _align_clusters(previous, model)
+    return model
+
+def update_cluster_model(model, counts):
+    # Online update from new reviews' term counts: document frequencies and IDF
+    # first, then one mini-batch step
+    model["doc_freq"] += np.asarray((counts > 0).sum(axis=0)).ravel()
+    model["n_docs"] += counts.shape[0]
+    _refresh_idf(model)
+
+    model["kmeans"].partial_fit(tfidf_from_counts(model, counts))
+    model["version"] += 1
+    return model
+
+def assign_clusters(model, counts):
+    tfidf_matrix = tfidf_from_counts(model, counts)
+    return tfidf_matrix, model["kmeans"].predict(tfidf_matrix)
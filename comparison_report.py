@@ -0,0 +1,292 @@
+import os
+import html
+import warnings
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from datetime import datetime
+from sklearn.feature_extraction.text import CountVectorizer
+from review_dataset import DATASET_DIR, read_reviews
+from term_matrix import grouped_term_counts, texts_without_terms
+from sentiment_engine import normalize_text
+from run_metrics import stage
+
+REPORT_DIR = os.path.join("outputs", "reports")
+# review_text is read separately, only for rows without saved term counts
+REPORT_COLUMNS = ["review_id", "bank", "source", "rating", "sentiment", "canonical_id"]
+ALL = "All"
+
+BOOTSTRAP_RESAMPLES = 1000
+CONFIDENCE = 0.95
+# Same polarity cuts as the dashboard
+NEGATIVE_SENTIMENT = -0.1
+POSITIVE_SENTIMENT = 0.1
+# Sentiment is resampled from a histogram with bins this wide over [-1, 1]
+SENTIMENT_BIN_WIDTH = 0.02
+
+KEYWORDS_PER_BANK = 10
+KEYWORD_VOCAB_SIZE = 20_000
+KEYWORD_MIN_COUNT = 3
+
+def group_histograms(df):
+    # One pass over the rows: every review lands in four groups, (bank, store),
+    # (bank, All), (All, store) and (All, All); per group, rating counts (1-5),
+    # a sentiment histogram and negative / neutral / positive counts come from bincount
+    bank_codes, bank_names = pd.factorize(df["bank"].astype(object).fillna("Unknown Bank"), sort=True)
+    src_codes, src_names = pd.factorize(df["source"].astype(object).fillna(""), sort=True)
+    nb, ns = len(bank_names), len(src_names)
+    width = ns + 1
+    codes = np.concatenate([
+        bank_codes * width + src_codes,
+        bank_codes * width + ns,
+        nb * width + src_codes,
+        np.full(len(df), nb * width + ns),
+    ])
+    n_groups = (nb + 1) * width
+
+    rating = pd.to_numeric(df["rating"], errors="coerce").to_numpy(dtype=float)
+    rated = np.tile((rating >= 1) & (rating <= 5), 4)
+    rating_idx = np.tile(np.nan_to_num(rating, nan=1).clip(1, 5).astype(int) - 1, 4)
+    rating_counts = np.bincount(codes[rated] * 5 + rating_idx[rated], minlength=n_groups * 5).reshape(n_groups, 5)
+
+    sentiment = pd.to_numeric(df["sentiment"], errors="coerce").fillna(0.0).to_numpy(dtype=float).clip(-1, 1)
+    n_bins = int(round(2 / SENTIMENT_BIN_WIDTH)) + 1
+    bins = np.tile(np.rint((sentiment + 1) / SENTIMENT_BIN_WIDTH).astype(int), 4)
+    sentiment_counts = np.bincount(codes * n_bins + bins, minlength=n_groups * n_bins).reshape(n_groups, n_bins)
+    polarity = np.tile(np.where(sentiment < NEGATIVE_SENTIMENT, 0, np.where(sentiment > POSITIVE_SENTIMENT, 2, 1)), 4)
+    polarity_counts = np.bincount(codes * 3 + polarity, minlength=n_groups * 3).reshape(n_groups, 3)
+    sentiment_sum = np.bincount(codes, weights=np.tile(sentiment, 4), minlength=n_groups)
+
+    groups = pd.DataFrame({
+        "bank": np.repeat(np.append(bank_names.astype(object), ALL), width),
+        "source": np.tile(np.append(src_names.astype(object), ALL), nb + 1),
+        "reviews": polarity_counts.sum(axis=1),
+    })
+    keep = groups["reviews"].to_numpy() > 0
+    return {
+        "groups": groups[keep].reset_index(drop=True),
+        "rating_counts": rating_counts[keep],
+        "sentiment_counts": sentiment_counts[keep],
+        "sentiment_centers": np.arange(n_bins) * SENTIMENT_BIN_WIDTH - 1,
+        "polarity_counts": polarity_counts[keep],
+        "sentiment_sum": sentiment_sum[keep],
+    }
+
+def _resampled_means(counts, values, draws, rng):
+    # Resampling a group's n reviews with replacement is one multinomial draw over
+    # its histogram, so all groups x draws come from a single call: (groups, draws)
+    n = counts.sum(axis=1)
+    p = counts / np.maximum(n, 1)[:, None]
+    p[n == 0] = 1 / counts.shape[1]
+    sampled = rng.multinomial(n[:, None], p[:, None, :], size=(len(n), draws))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (sampled @ values) / n[:, None]
+
+def bootstrap_intervals(hist, draws=BOOTSTRAP_RESAMPLES, confidence=CONFIDENCE, seed=42):
+    # Percentile bootstrap intervals on mean rating, mean sentiment and % negative,
+    # for every group at once
+    rng = np.random.default_rng(seed)
+    tails = [(1 - confidence) / 2 * 100, (1 + confidence) / 2 * 100]
+    n = hist["polarity_counts"].sum(axis=1)
+    negative = hist["polarity_counts"][:, 0]
+    rated = hist["rating_counts"].sum(axis=1)
+
+    mean_rating = _resampled_means(hist["rating_counts"], np.arange(1, 6), draws, rng)
+    mean_sentiment = _resampled_means(hist["sentiment_counts"], hist["sentiment_centers"], draws, rng)
+    negative_share = rng.binomial(n[:, None], (negative / n)[:, None], size=(len(n), draws)) / n[:, None] * 100
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        estimates = {
+            "mean_rating": hist["rating_counts"] @ np.arange(1, 6) / rated,
+            "mean_sentiment": hist["sentiment_sum"] / n,
+            "pct_negative": negative / n * 100,
+        }
+    out = hist["groups"].copy()
+    for name, resampled in [("mean_rating", mean_rating), ("mean_sentiment", mean_sentiment),
+                            ("pct_negative", negative_share)]:
+        with warnings.catch_warnings():
+            # Groups without ratings have no interval
+            warnings.simplefilter("ignore", RuntimeWarning)
+            low, high = np.nanpercentile(resampled, tails, axis=1)
+        out[name] = estimates[name]
+        out[f"{name}_low"] = np.where(np.isfinite(estimates[name]), low, np.nan)
+        out[f"{name}_high"] = np.where(np.isfinite(estimates[name]), high, np.nan)
+    return out
+
+def log_odds_keywords(y, terms, bank_names, top_n=KEYWORDS_PER_BANK, min_count=KEYWORD_MIN_COUNT):
+    # Weighted log-odds with an informative Dirichlet prior (Monroe et al., "Fightin' Words"):
+    # each bank's term counts (y: banks x terms) against the other banks', with the
+    # pooled counts as the prior; z-scores for every bank x term at once
+    y = np.asarray(y.todense() if sp.issparse(y) else y, dtype=float)
+    frequent = y.sum(axis=0) >= min_count
+    y, terms = y[:, frequent], np.asarray(terms, dtype=object)[frequent]
+    if not y.shape[1]:
+        return pd.DataFrame(columns=["bank", "term", "z", "count"])
+    alpha = y.sum(axis=0)
+    alpha0 = alpha.sum()
+    n_bank = y.sum(axis=1, keepdims=True)
+    y_rest = alpha - y
+    n_rest = alpha0 - n_bank
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = (np.log(y + alpha) - np.log(n_bank + alpha0 - y - alpha)
+                 - np.log(y_rest + alpha) + np.log(n_rest + alpha0 - y_rest - alpha))
+        z = delta / np.sqrt(1 / (y + alpha) + 1 / (y_rest + alpha))
+    z = np.where(np.isfinite(z) & (y > 0), z, -np.inf)
+
+    k = min(top_n, z.shape[1])
+    top = np.argsort(-z, axis=1, kind="stable")[:, :k]
+    rows = np.repeat(np.arange(len(bank_names)), k)
+    cols = top.ravel()
+    result = pd.DataFrame({
+        "bank": np.asarray(bank_names, dtype=object)[rows],
+        "term": terms[cols],
+        "z": z[rows, cols],
+        "count": y[rows, cols].astype(int),
+    })
+    return result[np.isfinite(result["z"])].reset_index(drop=True)
+
+def distinguishing_keywords(df, terms_root=None, top_n=KEYWORDS_PER_BANK, vocab_size=KEYWORD_VOCAB_SIZE):
+    # Bank x term counts from the analysis stage's saved term matrices, tokenizing the
+    # text of rows without them; without saved terms, by tokenizing all the text
+    bank_codes, bank_names = pd.factorize(df["bank"].astype(object).fillna("Unknown Bank"), sort=True)
+    counts = None
+    if terms_root is not None and "review_id" in df.columns:
+        counts = grouped_term_counts(df["review_id"].values, bank_codes, len(bank_names), root=terms_root,
+                                     texts=df["review_text"].values if "review_text" in df.columns else None)
+    if counts is None:
+        vectorizer = CountVectorizer(preprocessor=normalize_text, ngram_range=(1, 2), stop_words="english",
+                                     max_features=vocab_size)
+        try:
+            X = vectorizer.fit_transform(df["review_text"].fillna("").astype(str))
+        except ValueError:
+            return pd.DataFrame(columns=["bank", "term", "z", "count"])
+        B = sp.csr_matrix((np.ones(len(bank_codes)), (bank_codes, np.arange(len(bank_codes)))),
+                          shape=(len(bank_names), len(bank_codes)))
+        counts = B @ X, vectorizer.get_feature_names_out()
+    y, terms = counts
+    if y.shape[1] > vocab_size:
+        # Most frequent terms only, as with the vectorizer's max_features
+        totals = np.asarray(y.sum(axis=0)).ravel()
+        keep = np.sort(np.argsort(-totals, kind="stable")[:vocab_size])
+        y, terms = y[:, keep], terms[keep]
+    return log_odds_keywords(y, terms, bank_names, top_n=top_n)
+
+def comparison_report(df, deduplicated=True, draws=BOOTSTRAP_RESAMPLES, confidence=CONFIDENCE, seed=42, terms_root=None):
+    # Tables behind the report, from an analysis-shaped frame
+    if deduplicated and "canonical_id" in df.columns:
+        df = df[df["canonical_id"].isna() | ~df["canonical_id"].duplicated()]
+    with stage("report.aggregate", rows_in=len(df)):
+        hist = group_histograms(df)
+    with stage("report.bootstrap", rows_in=len(hist["groups"])):
+        summary = bootstrap_intervals(hist, draws, confidence, seed)
+    ratings = hist["groups"].copy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shares = hist["rating_counts"] / hist["rating_counts"].sum(axis=1, keepdims=True) * 100
+        polarity = hist["polarity_counts"] / hist["polarity_counts"].sum(axis=1, keepdims=True) * 100
+    for i in range(5):
+        ratings[f"{i + 1}★ %"] = shares[:, i]
+    for i, name in enumerate(["Negative", "Neutral", "Positive"]):
+        ratings[f"{name} %"] = polarity[:, i]
+    with stage("report.keywords", rows_in=len(df)):
+        keywords = distinguishing_keywords(df, terms_root=terms_root)
+    return {"summary": summary, "distributions": ratings, "keywords": keywords,
+            "reviews": len(df), "deduplicated": deduplicated, "confidence": confidence, "draws": draws}
+
+# ---------- Rendering ----------
+def _interval(row, name, fmt):
+    if pd.isna(row[name]):
+        return "–"
+    return f"{row[name]:{fmt}} [{row[f'{name}_low']:{fmt}}, {row[f'{name}_high']:{fmt}}]"
+
+def _summary_table(report):
+    s = report["summary"]
+    return pd.DataFrame({
+        "Bank": s["bank"], "Store": s["source"], "Reviews": s["reviews"].map("{:,}".format),
+        "Mean rating": [_interval(r, "mean_rating", ".2f") for _, r in s.iterrows()],
+        "Mean sentiment": [_interval(r, "mean_sentiment", ".3f") for _, r in s.iterrows()],
+        "% negative": [_interval(r, "pct_negative", ".1f") for _, r in s.iterrows()],
+    })
+
+def _distribution_table(report):
+    d = report["distributions"].rename(columns={"bank": "Bank", "source": "Store", "reviews": "Reviews"})
+    return d.round(1).fillna("–")
+
+def _keyword_table(report):
+    k = report["keywords"]
+    if k.empty:
+        return pd.DataFrame(columns=["Bank", "Distinguishing keywords (z)"])
+    k = k.assign(label=k["term"] + " (" + k["z"].round(1).astype(str) + ")")
+    return k.groupby("bank", sort=True)["label"].agg(", ".join).reset_index() \
+        .rename(columns={"bank": "Bank", "label": "Distinguishing keywords (z)"})
+
+def _sections(report):
+    level = f"{report['confidence']:.0%}"
+    return [
+        ("Ratings and sentiment by bank and store",
+         f"Point estimates with {level} bootstrap intervals ({report['draws']:,} resamples).",
+         _summary_table(report)),
+        ("Rating and sentiment distributions", "Share of reviews per star rating and sentiment polarity.",
+         _distribution_table(report)),
+        ("Distinguishing keywords", "Terms most over-represented in each bank's reviews relative to all banks "
+         "(weighted log-odds with an informative Dirichlet prior; z above 1.96 is significant at 5%).",
+         _keyword_table(report)),
+    ]
+
+def _intro(report, title):
+    counting = "near-duplicates counted once" if report["deduplicated"] else "raw counts"
+    return title, f"Generated {datetime.now():%Y-%m-%d %H:%M} from {report['reviews']:,} reviews ({counting})."
+
+def _markdown_table(table):
+    header = "| " + " | ".join(map(str, table.columns)) + " |"
+    rule = "|" + "|".join("---" for _ in table.columns) + "|"
+    body = ["| " + " | ".join(str(v).replace("|", "\\|") for v in row) + " |" for row in table.itertuples(index=False)]
+    return "\n".join([header, rule] + body)
+
+def render_markdown(report, title="Bank App Review Comparison"):
+    title, subtitle = _intro(report, title)
+    parts = [f"# {title}", subtitle]
+    for heading, note, table in _sections(report):
+        parts += [f"## {heading}", note, _markdown_table(table)]
+    return "\n\n".join(parts) + "\n"
+
+_HTML_STYLE = """
+body { font-family: -apple-system, Segoe UI, Roboto, sans-serif; margin: 2rem; color: #222; }
+table { border-collapse: collapse; margin: 1rem 0 2rem; font-size: 14px; }
+th, td { border: 1px solid #ddd; padding: 6px 10px; text-align: left; }
+th { background: #f4f4f4; }
+p.note { color: #666; }
+"""
+
+def render_html(report, title="Bank App Review Comparison"):
+    title, subtitle = _intro(report, title)
+    parts = [f"<h1>{html.escape(title)}</h1>", f"<p class='note'>{html.escape(subtitle)}</p>"]
+    for heading, note, table in _sections(report):
+        parts += [f"<h2>{html.escape(heading)}</h2>", f"<p class='note'>{html.escape(note)}</p>",
+                  table.to_html(index=False, border=0, escape=True)]
+    return (f"<!DOCTYPE html>\n<html><head><meta charset='utf-8'><title>{html.escape(title)}</title>"
+            f"<style>{_HTML_STYLE}</style></head><body>\n" + "\n".join(parts) + "\n</body></html>\n")
+
+def write_comparison_report(output_path=None, fmt="html", banks=None, sources=None, since=None,
+                            deduplicated=True, draws=BOOTSTRAP_RESAMPLES, confidence=CONFIDENCE):
+    # Compares every bank in the analysis dataset (not just the latest run)
+    if fmt not in ("html", "md"):
+        raise ValueError(f"Unknown report format: {fmt}")
+    with stage("report.read") as s:
+        df = read_reviews("analysis", columns=REPORT_COLUMNS, banks=banks, sources=sources, since=since)
+        df["review_text"] = texts_without_terms(df, "analysis", banks=banks, sources=sources, since=since)
+        s.rows_out = len(df)
+    if df.empty:
+        print("[REPORT] ⚠️ The analysis dataset is empty, no report written")
+        return None
+
+    report = comparison_report(df, deduplicated=deduplicated, draws=draws, confidence=confidence, terms_root=DATASET_DIR)
+    with stage("report.render"):
+        text = render_html(report) if fmt == "html" else render_markdown(report)
+    output_path = output_path or os.path.join(REPORT_DIR, f"comparison_{datetime.now():%Y%m%d_%H%M%S}.{fmt}")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    print(f"[REPORT] 📑 Comparison of {df['bank'].nunique()} bank(s) "
+          f"over {report['reviews']:,} reviews written to {output_path}")
+    return output_path
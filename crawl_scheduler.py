@@ -0,0 +1,143 @@
+import json
+import time
+import random
+import threading
+from datetime import datetime
+from urllib.parse import urlparse
+from review_store import REVIEW_STORE_PATH
+from sqlite_db import connect
+
+# Sustained requests/second and burst size per store host
+HOST_RATE_LIMITS = {
+    "itunes.apple.com": (5.0, 10),
+    "play.google.com": (3.0, 6),
+}
+DEFAULT_RATE_LIMIT = (5.0, 10)
+
+# Throttling and server errors are retried with exponential backoff and full jitter
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # Blocks until a token is available; the sleep happens outside the lock
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def bucket_for(host):
+    with _buckets_lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket(*HOST_RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT))
+        return _buckets[host]
+
+def set_rate_limit(host, rate, burst=None):
+    HOST_RATE_LIMITS[host] = (rate, burst or max(1, int(rate * 2)))
+    with _buckets_lock:
+        _buckets.pop(host, None)
+
+def host_of(url):
+    return urlparse(url).hostname or url
+
+def backoff_delay(attempt, retry_after=None):
+    # Full jitter: uniform in [0, base * 2^attempt], capped; the server's Retry-After wins
+    if retry_after is not None:
+        return min(BACKOFF_MAX, retry_after)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def _retry_after(response):
+    value = getattr(response, "headers", {}).get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def with_retries(request, host, label, retry_on=(), max_retries=None):
+    # request() makes one attempt. Responses with a retryable status and the
+    # exceptions in retry_on are retried; the last response is returned or the
+    # last exception raised once the retries are used up.
+    max_retries = MAX_RETRIES if max_retries is None else max_retries
+    bucket = bucket_for(host)
+    for attempt in range(max_retries + 1):
+        bucket.acquire()
+        try:
+            response = request()
+        except retry_on as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"[SCHEDULER] ⚠️ {label}: {e.__class__.__name__}, retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+
+        status = getattr(response, "status_code", None)
+        if status in RETRY_STATUSES and attempt < max_retries:
+            delay = backoff_delay(attempt, _retry_after(response))
+            print(f"[SCHEDULER] ⚠️ {label}: HTTP {status}, retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        return response
+
+# ---------- Checkpoints ----------
+# One row per (source, app, country) crawl that has not finished yet; cursor is
+# the JSON-encoded place to resume from (Apple: next page, Google: continuation token)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+    source     TEXT NOT NULL,
+    app_id     TEXT NOT NULL,
+    country    TEXT NOT NULL,
+    cursor     TEXT NOT NULL,
+    run_id     TEXT,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (source, app_id, country)
+);
+"""
+
+def load_checkpoint(source, app_id, country, db_path=REVIEW_STORE_PATH):
+    conn = connect(db_path, _SCHEMA)
+    try:
+        row = conn.execute(
+            "SELECT cursor FROM crawl_checkpoints WHERE source = ? AND app_id = ? AND country = ?",
+            (source, str(app_id), country)
+        ).fetchone()
+    finally:
+        conn.close()
+    return json.loads(row[0]) if row else None
+
+def save_checkpoint(source, app_id, country, cursor, run_id=None, db_path=REVIEW_STORE_PATH):
+    # cursor None means the crawl finished: the checkpoint is dropped
+    conn = connect(db_path, _SCHEMA)
+    try:
+        with conn:
+            if cursor is None:
+                conn.execute(
+                    "DELETE FROM crawl_checkpoints WHERE source = ? AND app_id = ? AND country = ?",
+                    (source, str(app_id), country)
+                )
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO crawl_checkpoints (source, app_id, country, cursor, run_id, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (source, str(app_id), country, json.dumps(cursor), run_id, datetime.now().isoformat(timespec="seconds"))
+                )
+    finally:
+        conn.close()
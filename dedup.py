@@ -0,0 +1,274 @@
+import os
+import re
+import functools
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sentiment_engine import normalize_text
+from review_store import review_key
+from sqlite_db import connect, select_in
+
+DEDUP_INDEX_PATH = os.path.join("outputs", "dedup_index.sqlite")
+
+# Reviews whose estimated Jaccard similarity of character shingles reaches the
+# threshold are near-duplicates and share one canonical_id
+DEDUP_THRESHOLD = 0.8
+NUM_PERM = 128
+SHINGLE_SIZE = 5
+DEDUP_SEED = 42
+
+# Shingle x permutation values computed at once (uint64): bounds memory per block
+BLOCK_VALUES = 1_000_000
+
+_SHIFT = np.uint64(32)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_ROLL_BASE = np.uint64(1_000_003)
+_NON_WORD = re.compile(r"[\W_]+")
+
+# Only canonical reviews are bucketed; their duplicates point at them through signatures
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    review_id    TEXT PRIMARY KEY,
+    canonical_id TEXT NOT NULL,
+    signature    BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lsh_buckets (
+    band      INTEGER NOT NULL,
+    bucket    INTEGER NOT NULL,
+    review_id TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, review_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dedup_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def _connect(db_path, params):
+    conn = connect(db_path, _SCHEMA)
+    # Signatures and buckets only compare under the same permutations and banding
+    row = conn.execute("SELECT value FROM dedup_meta WHERE key = 'params'").fetchone()
+    if row is None or row[0] != params:
+        if row is not None:
+            print(f"[DEDUP] ⚠️ Index built with {row[0]}, now {params}: rebuilding")
+        with conn:
+            conn.execute("DELETE FROM signatures")
+            conn.execute("DELETE FROM lsh_buckets")
+            conn.execute("INSERT OR REPLACE INTO dedup_meta (key, value) VALUES ('params', ?)", (params,))
+    return conn
+
+@functools.lru_cache(maxsize=None)
+def lsh_params(threshold, num_perm=NUM_PERM):
+    # (bands, rows) whose S-curve 1 - (1 - s^rows)^bands best separates pairs
+    # below the threshold from pairs above it (least false positive + negative area)
+    s = np.linspace(0, 1, 201)
+    below = s < threshold
+    best = None
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            p = 1 - (1 - s ** rows) ** bands
+            error = p[below].sum() + (1 - p[~below]).sum()
+            if best is None or error < best[0]:
+                best = (error, bands, rows)
+    return best[1], best[2]
+
+@functools.lru_cache(maxsize=None)
+def _permutations(num_perm, seed):
+    # Multiply-shift hashing of 32-bit shingle hashes: h(x) = ((a * x + b) mod 2^64) >> 32,
+    # a odd; cheaper than a prime modulus and as good for MinHash
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+    return a, b
+
+@functools.lru_cache(maxsize=None)
+def _band_multipliers(rows, seed):
+    return np.random.default_rng(seed + 1).integers(1, 1 << 63, size=rows, dtype=np.uint64) | np.uint64(1)
+
+def _shingle_hashes(texts, shingle_size):
+    # Rolling hashes of every window of shingle_size characters of the normalized
+    # text (Arabic letter variants folded, punctuation dropped), as
+    # (hashes, shingles per text); texts shorter than a shingle are one shingle
+    codes = []
+    for text in texts:
+        text = _NON_WORD.sub(" ", normalize_text(text)).strip()
+        c = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        if 0 < len(c) < shingle_size:
+            c = np.concatenate([c, np.zeros(shingle_size - len(c), dtype=np.uint32)])
+        codes.append(c)
+    lengths = np.array([len(c) for c in codes], dtype=np.int64)
+    counts = np.where(lengths > 0, lengths - shingle_size + 1, 0)
+    if not counts.sum():
+        return np.array([], dtype=np.uint64), counts
+
+    buf = np.concatenate(codes).astype(np.uint64)
+    n_windows = len(buf) - shingle_size + 1
+    rolled = np.zeros(n_windows, dtype=np.uint64)
+    for j in range(shingle_size):
+        rolled = rolled * _ROLL_BASE + buf[j:j + n_windows]
+    # Windows that start inside one text and end inside the next are skipped
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    shingle_starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    positions = np.arange(counts.sum()) + np.repeat(offsets - shingle_starts, counts)
+    hashes = rolled[positions]
+    return (hashes ^ (hashes >> _SHIFT)) & _MAX_HASH, counts
+
+def minhash_signatures(texts, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=DEDUP_SEED):
+    # (texts x num_perm) uint32 MinHash signatures; empty texts keep all-max rows
+    a, b = _permutations(num_perm, seed)
+    hashes, counts = _shingle_hashes(texts, shingle_size)
+    signatures = np.full((len(counts), num_perm), 0xFFFFFFFF, dtype=np.uint32)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    block = max(1, BLOCK_VALUES // num_perm)
+    values = np.empty((block, num_perm), dtype=np.uint64)
+
+    first = 0
+    while first < len(counts):
+        # As many whole texts as fit in one block of shingles
+        last = max(first + 1, int(np.searchsorted(ends, starts[first] + block, side="right")))
+        nonempty = first + np.flatnonzero(counts[first:last])
+        if len(nonempty):
+            lo, hi = starts[first], ends[last - 1]
+            # In place; a single text longer than the block gets its own buffer
+            out = values[:hi - lo] if hi - lo <= block else np.empty((hi - lo, num_perm), dtype=np.uint64)
+            np.multiply(hashes[lo:hi, None], a, out=out)
+            out += b
+            out >>= _SHIFT
+            signatures[nonempty] = np.minimum.reduceat(out, starts[nonempty] - lo, axis=0)
+        first = last
+    return signatures
+
+def band_keys(signatures, bands, rows, seed=DEDUP_SEED):
+    # One int64 bucket key per signature and band
+    multipliers = _band_multipliers(rows, seed)
+    sig = signatures[:, :bands * rows].astype(np.uint64).reshape(len(signatures), bands, rows)
+    return (sig * multipliers).sum(axis=2).view(np.int64)
+
+def _similar(sig_a, sig_b, threshold):
+    return (sig_a == sig_b).mean(axis=1) >= threshold
+
+def _chunk_pairs(keys, signatures, threshold):
+    # Rows sharing a bucket in any band are candidates; each is checked against
+    # the first row of its bucket
+    pairs = []
+    for band in range(keys.shape[1]):
+        order = np.argsort(keys[:, band], kind="stable")
+        sorted_keys = keys[order, band]
+        new_bucket = np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]])
+        heads = order[np.maximum.accumulate(np.where(new_bucket, np.arange(len(order)), 0))]
+        members = ~new_bucket
+        pairs.append(np.stack([heads[members], order[members]], axis=1))
+    pairs = np.unique(np.concatenate(pairs), axis=0) if pairs else np.empty((0, 2), dtype=np.int64)
+    if len(pairs):
+        pairs = pairs[_similar(signatures[pairs[:, 0]], signatures[pairs[:, 1]], threshold)]
+    return pairs
+
+def review_ids(df):
+    if "review_id" in df.columns:
+        ids = df["review_id"].astype(object).where(df["review_id"].notna(), None).tolist()
+    else:
+        ids = [None] * len(df)
+    missing = [i for i, r in enumerate(ids) if not r]
+    if missing:
+        # Legacy CSV rows without an ID get the same key the review store would give them
+        cols = {c: df[c].tolist() if c in df.columns else [""] * len(df) for c in ("source", "app_id", "author", "review_text")}
+        for i in missing:
+            ids[i] = review_key(cols["source"][i], cols["app_id"][i], cols["author"][i], cols["review_text"][i])
+    return [str(r) for r in ids]
+
+def assign_canonical_ids(df, threshold=DEDUP_THRESHOLD, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE,
+                         seed=DEDUP_SEED, db_path=DEDUP_INDEX_PATH):
+    # canonical_id per row: the ID of the first review seen with (nearly) the same text.
+    # With a db_path, reviews from earlier chunks and runs are matched too; db_path=None
+    # deduplicates within df only.
+    ids = review_ids(df)
+    texts = df["review_text"].fillna("").astype(str).tolist() if "review_text" in df.columns else [""] * len(df)
+    canonical = list(ids)
+    bands, rows = lsh_params(threshold, num_perm)
+    params = f"perm={num_perm},shingle={shingle_size},seed={seed},bands={bands},rows={rows}"
+
+    conn = _connect(db_path, params) if db_path else None
+    try:
+        # Reviews analyzed before keep their canonical_id, so re-runs are stable
+        known = {}
+        if conn is not None:
+            known.update(select_in(conn, "SELECT review_id, canonical_id FROM signatures WHERE review_id IN ({values})",
+                                   dict.fromkeys(ids)))
+        todo = np.array([i for i, r in enumerate(ids) if r not in known], dtype=np.int64)
+        for i, r in enumerate(ids):
+            if r in known:
+                canonical[i] = known[r]
+        if not len(todo):
+            return pd.Series(canonical, index=df.index, name="canonical_id")
+
+        signatures = minhash_signatures([texts[i] for i in todo], num_perm, shingle_size, seed)
+        has_text = (signatures != 0xFFFFFFFF).any(axis=1)
+        keys = band_keys(signatures, bands, rows, seed)
+
+        # Candidate pairs inside the chunk; texts without shingles never match
+        text_rows = np.flatnonzero(has_text)
+        pairs = text_rows[_chunk_pairs(keys[text_rows], signatures[text_rows], threshold)] \
+            if len(text_rows) else np.empty((0, 2), dtype=np.int64)
+
+        # Candidates among the canonical reviews already in the index
+        stored_ids, stored_pairs = [], np.empty((0, 2), dtype=np.int64)
+        if conn is not None and len(text_rows):
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS probe (row INTEGER, band INTEGER, bucket INTEGER)")
+            conn.execute("DELETE FROM probe")
+            conn.executemany(
+                "INSERT INTO probe (row, band, bucket) VALUES (?, ?, ?)",
+                ((int(r), band, int(keys[r, band])) for r in text_rows for band in range(bands))
+            )
+            matches = conn.execute(
+                "SELECT DISTINCT p.row, s.review_id, s.signature FROM probe p "
+                "JOIN lsh_buckets l ON l.band = p.band AND l.bucket = p.bucket "
+                "JOIN signatures s ON s.review_id = l.review_id"
+            ).fetchall()
+            if matches:
+                stored_index = {}
+                stored_sigs = []
+                for _, review_id, blob in matches:
+                    if review_id not in stored_index:
+                        stored_index[review_id] = len(stored_ids)
+                        stored_ids.append(review_id)
+                        stored_sigs.append(np.frombuffer(blob, dtype=np.uint32))
+                rows_idx = np.array([m[0] for m in matches], dtype=np.int64)
+                stored_idx = np.array([stored_index[m[1]] for m in matches], dtype=np.int64)
+                ok = _similar(signatures[rows_idx], np.stack(stored_sigs)[stored_idx], threshold)
+                stored_pairs = np.stack([rows_idx[ok], len(todo) + stored_idx[ok]], axis=1)
+
+        # Connected components over both kinds of pairs; a stored review heads its
+        # component if there is one, else the first row of the chunk
+        edges = np.concatenate([pairs, stored_pairs])
+        n_nodes = len(todo) + len(stored_ids)
+        graph = coo_matrix((np.ones(len(edges)), (edges[:, 0], edges[:, 1])), shape=(n_nodes, n_nodes))
+        n_components, labels = connected_components(graph, directed=False)
+        nodes = np.arange(n_nodes)
+        priority = np.where(nodes >= len(todo), nodes - len(todo), nodes + len(stored_ids))
+        best = np.full(n_components, n_nodes, dtype=np.int64)
+        np.minimum.at(best, labels, priority)
+        heads = np.where(best < len(stored_ids), best + len(todo), best - len(stored_ids))
+        node_ids = [ids[i] for i in todo] + stored_ids
+        for j, i in enumerate(todo):
+            canonical[i] = node_ids[heads[labels[j]]]
+
+        if conn is not None:
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO signatures (review_id, canonical_id, signature) VALUES (?, ?, ?)",
+                    ((ids[i], canonical[i], signatures[j].tobytes()) for j, i in enumerate(todo))
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO lsh_buckets (band, bucket, review_id) VALUES (?, ?, ?)",
+                    ((band, int(keys[j, band]), ids[i])
+                     for j, i in enumerate(todo) if has_text[j] and canonical[i] == ids[i] for band in range(bands))
+                )
+    finally:
+        if conn is not None:
+            conn.close()
+
+    duplicates = sum(1 for i in todo if canonical[i] != ids[i])
+    print(f"[DEDUP] {duplicates} of {len(todo)} new reviews are near-duplicates (threshold {threshold})")
+    return pd.Series(canonical, index=df.index, name="canonical_id")
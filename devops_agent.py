@@ -0,0 +1,27 @@
+import os
+import sys
+import subprocess
+import importlib.util
+
+DASHBOARD_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tools", "csat_dashboard.py")
+DEFAULT_DASHBOARD_DATA = os.path.join("outputs", "dataset", "analysis")
+DEFAULT_PORT = 8501
+
+def launch_dashboard(data_path=None, port=DEFAULT_PORT, wait=True):
+    # Serves the CSAT dashboard with `streamlit run` in its own process, so
+    # Streamlit is never imported here; returns the process (None without Streamlit)
+    if importlib.util.find_spec("streamlit") is None:
+        print("[DEVOPS agent] ⚠️ Streamlit is not installed (pip install streamlit); skipping the dashboard")
+        return None
+    data_path = data_path or DEFAULT_DASHBOARD_DATA
+    command = [sys.executable, "-m", "streamlit", "run", DASHBOARD_SCRIPT,
+               "--server.port", str(port), "--server.headless", "true", "--", data_path]
+    print(f"[DEVOPS agent] 🚀 Dashboard for {data_path} on http://localhost:{port} (Ctrl+C to stop)")
+    process = subprocess.Popen(command)
+    if wait:
+        try:
+            process.wait()
+        except KeyboardInterrupt:
+            process.terminate()
+            process.wait()
+    return process
@@ -0,0 +1,72 @@
+import os
+import time
+import hashlib
+import numpy as np
+from sqlite_db import connect, select_in
+
+FEATURE_CACHE_PATH = os.path.join("outputs", "feature_cache.sqlite")
+
+# Least recently used entries beyond this many are evicted after each write
+MAX_ENTRIES = 1_000_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS features (
+    feature_key TEXT PRIMARY KEY,
+    sentiment   REAL NOT NULL,
+    term_idx    BLOB NOT NULL,
+    term_cnt    BLOB NOT NULL,
+    last_used   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_features_last_used ON features (last_used);
+"""
+
+def normalize_for_key(text):
+    return " ".join(str(text).lower().split())
+
+def feature_key(text, model_version):
+    # Same normalized text under the same sentiment engine + vocabulary -> same features
+    return hashlib.sha1(f"{model_version}\x1f{normalize_for_key(text)}".encode("utf-8")).hexdigest()
+
+def get_features(keys, db_path=FEATURE_CACHE_PATH):
+    # {key: (sentiment, term_idx, term_cnt)} for the keys that are cached
+    keys = list(dict.fromkeys(keys))
+    found = {}
+    if not keys:
+        return found
+    conn = connect(db_path, _SCHEMA)
+    try:
+        rows = select_in(conn, "SELECT feature_key, sentiment, term_idx, term_cnt FROM features "
+                               "WHERE feature_key IN ({values})", keys)
+        for key, sentiment, idx, cnt in rows:
+            found[key] = (sentiment, np.frombuffer(idx, dtype=np.int32), np.frombuffer(cnt, dtype=np.float32))
+        if found:
+            now = time.time()
+            with conn:
+                conn.executemany("UPDATE features SET last_used = ? WHERE feature_key = ?", [(now, k) for k in found])
+    finally:
+        conn.close()
+    return found
+
+def put_features(entries, db_path=FEATURE_CACHE_PATH, max_entries=MAX_ENTRIES):
+    # entries: iterable of (key, sentiment, term_idx, term_cnt)
+    now = time.time()
+    conn = connect(db_path, _SCHEMA)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO features (feature_key, sentiment, term_idx, term_cnt, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (key, float(sentiment), np.asarray(idx, dtype=np.int32).tobytes(),
+                     np.asarray(cnt, dtype=np.float32).tobytes(), now)
+                    for key, sentiment, idx, cnt in entries
+                ]
+            )
+            size = conn.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+            if size > max_entries:
+                conn.execute(
+                    "DELETE FROM features WHERE feature_key IN "
+                    "(SELECT feature_key FROM features ORDER BY last_used LIMIT ?)", (size - max_entries,)
+                )
+    finally:
+        conn.close()
@@ -1,49 +1,72 @@
-from typing import TypedDict
+import operator
+from typing import Annotated, TypedDict
 from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
-from oryx_spider import scrape_reviews
-from ai_ml_agent import analyze_reviews
+from langgraph.types import Send
+from oryx_spider import run_spider_on_bank
+from ai_ml_agent import run_aiml_models_on_run
+from comparison_report import write_comparison_report
+from run_metrics import instrumented, new_run_id
 
 class MaistroState(TypedDict, total=False):
     user_input: str
-    appstore_id: str
-    playstore_package: str
-    appstore_country: str
-    playstore_country: str
-    playstore_lang: str
-    num_reviews: int
-    review_file: str
+    banks: list
+    run_id: str
+    bank_results: Annotated[list, operator.add]
+    review_count: int
     ai_ml_output_file: str
+    report_file: str
     summary: str
 
+class BankScrapeState(TypedDict):
+    bank: dict
+    run_id: str
+
 def parse_input(state: MaistroState) -> MaistroState:
-    return state
-
-def perform_scraping(state: MaistroState) -> MaistroState:
-    filename, a_ct, g_ct, total = scrape_reviews(
-        appstore_id=state["appstore_id"],
-        playstore_package=state["playstore_package"],
-        appstore_country=state.get("appstore_country", "us"),
-        playstore_country=state.get("playstore_country", "us"),
-        playstore_lang=state.get("playstore_lang", "en"),
-        num_reviews=state.get("num_reviews", 100)
-    )
-    state["review_file"] = filename
-    state["summary"] = f"Scraped {total} reviews. Apple: {a_ct}, Google: {g_ct}"
-    return state
+    # One run ID shared by every bank branch of this graph run
+    return {"run_id": state.get("run_id") or new_run_id()}
+
+def fan_out_banks(state: MaistroState):
+    # One scrape branch per bank; LangGraph runs the branches in parallel
+    return [Send("scrape_bank", {"bank": bank, "run_id": state["run_id"]}) for bank in state["banks"]]
+
+def scrape_bank(state: BankScrapeState) -> MaistroState:
+    # Reviews stream straight into the dataset; only per-source counts travel through the graph
+    _, written = run_spider_on_bank(**state["bank"], run_id=state["run_id"])
+    return {"bank_results": [{
+        "bank_name": state["bank"]["bank_name"],
+        "new_reviews": sum(written.values()),
+        "apple": written.get("Apple", 0),
+        "google": written.get("Google", 0),
+    }]}
+
+def join_banks(state: MaistroState) -> MaistroState:
+    results = state.get("bank_results", [])
+    total = sum(r["new_reviews"] for r in results)
+    lines = [f"{r['bank_name']}: {r['new_reviews']} new (Apple: {r['apple']}, Google: {r['google']})" for r in results]
+    return {"review_count": total, "summary": f"Scraped {total} new reviews for run {state['run_id']}.\n" + "\n".join(lines)}
+
+def route_after_join(state: MaistroState):
+    return "run_ai_models" if state.get("review_count") else END
 
 def run_ai_models(state: MaistroState) -> MaistroState:
-    output_file = analyze_reviews(state["review_file"])
-    state["ai_ml_output_file"] = output_file
-    return state
+    output_file = run_aiml_models_on_run(state["run_id"])
+    return {"ai_ml_output_file": output_file}
+
+def write_report(state: MaistroState) -> MaistroState:
+    # Compares every bank analyzed so far, not only this run's new reviews
+    return {"report_file": write_comparison_report()}
 
 def build_maistro_graph():
     builder = StateGraph(MaistroState)
-    builder.add_node("parse_input", RunnableLambda(parse_input))
-    builder.add_node("scrape_reviews", RunnableLambda(perform_scraping))
-    builder.add_node("run_ai_models", RunnableLambda(run_ai_models))
+    # Every node is timed as a "graph.<node>" stage in the run metrics
+    for name, node in [("parse_input", parse_input), ("scrape_bank", scrape_bank),
+                       ("join_banks", join_banks), ("run_ai_models", run_ai_models), ("write_report", write_report)]:
+        builder.add_node(name, RunnableLambda(instrumented(f"graph.{name}")(node)))
     builder.set_entry_point("parse_input")
-    builder.add_edge("parse_input", "scrape_reviews")
-    builder.add_edge("scrape_reviews", "run_ai_models")
-    builder.add_edge("run_ai_models", END)
+    builder.add_conditional_edges("parse_input", fan_out_banks, ["scrape_bank"])
+    builder.add_edge("scrape_bank", "join_banks")
+    builder.add_conditional_edges("join_banks", route_after_join, ["run_ai_models", END])
+    builder.add_edge("run_ai_models", "write_report")
+    builder.add_edge("write_report", END)
     return builder.compile()
@@ -1,5 +1,134 @@
-from oryx_maistro import OrYxMaistroAgent
+import sys
+import argparse
+
+# Only argparse is imported up front: every command imports what it needs when it
+# runs, so `--help` and scraping never load the AI/ML stack or Streamlit
+
+def _scrape(args):
+    from oryx_spider import run_spider_on_banks
+    from run_metrics import new_run_id, start_run, write_run_metrics
+
+    if args.config:
+        from oryx_maistro import load_batch_config
+        banks, max_concurrency = load_batch_config(args.config)
+    else:
+        if not (args.bank and args.apple_id and args.google_package):
+            sys.exit("scrape: pass --config, or --bank, --apple-id and --google-package")
+        banks = [dict(bank_name=args.bank, apple_id=args.apple_id, google_package=args.google_package,
+                      apple_country=args.apple_country, google_country=args.google_country,
+                      google_lang=args.google_lang, max_reviews=args.max_reviews)]
+        max_concurrency = None
+
+    run_id = args.run_id or new_run_id()
+    start_run(run_id)
+    try:
+        results = run_spider_on_banks([dict(bank, run_id=run_id, incremental=not args.full) for bank in banks],
+                                      max_concurrency=args.max_concurrency or max_concurrency)
+    finally:
+        write_run_metrics(run_id)
+    total = sum(sum(written.values()) for _, written in results)
+    print(f"\n[MAISTRO agent] ✅ {total} reviews stored for run {run_id}")
+    if total:
+        print(f"[MAISTRO agent] Next: python main.py analyze --run-id {run_id}")
+
+def _analyze(args):
+    from ai_ml_agent import run_aiml_models_on_run, run_aiml_models_on_file
+    from run_metrics import start_run, write_run_metrics
+
+    options = dict(sentiment_engine=args.sentiment_engine, refit=args.refit,
+                   n_clusters=args.n_clusters if args.n_clusters in (None, "auto") else int(args.n_clusters))
+    if args.dedup_threshold is not None:
+        options["dedup_threshold"] = args.dedup_threshold
+    if args.csv:
+        run_aiml_models_on_file(args.csv, chunk_size=args.chunk_size, **options)
+        return
+    start_run(args.run_id)
+    try:
+        run_aiml_models_on_run(args.run_id, chunk_size=args.chunk_size, **options)
+    finally:
+        write_run_metrics(args.run_id)
+
+def _report(args):
+    from comparison_report import write_comparison_report
+    write_comparison_report(output_path=args.output, fmt=args.format, banks=args.bank, sources=args.source,
+                            since=args.since, deduplicated=not args.raw, draws=args.resamples)
+
+def _dashboard(args):
+    from devops_agent import launch_dashboard
+    if launch_dashboard(args.data, port=args.port) is None:
+        sys.exit(1)
+
+def _run_all(args):
+    if args.config:
+        from oryx_maistro import run_batch
+        run_batch(args.config)
+    else:
+        from oryx_maistro import OrYxMaistroAgent
+        print("Hello, I am OrYx Maistro (LangGraph Orchestrator Agent). How can I help you?\n")
+        OrYxMaistroAgent()
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="OrYx Maistro review pipeline")
+    parser.add_argument("--config", help="Same as `run-all --config`: run unattended over the banks in this YAML config")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+
+    scrape = commands.add_parser("scrape", help="Scrape new reviews into the reviews dataset")
+    scrape.add_argument("--config", help="YAML config with the banks to scrape (e.g. config/banks.yaml)")
+    scrape.add_argument("--bank", help="Bank name, when scraping a single bank")
+    scrape.add_argument("--apple-id", help="Apple App Store app ID")
+    scrape.add_argument("--google-package", help="Google Play package name")
+    scrape.add_argument("--apple-country", default="us")
+    scrape.add_argument("--google-country", default="us")
+    scrape.add_argument("--google-lang", default="en")
+    scrape.add_argument("--max-reviews", type=int, default=100, help="Reviews per store")
+    scrape.add_argument("--max-concurrency", type=int, help="Requests in flight across all banks")
+    scrape.add_argument("--run-id", help="Run ID to write under (default: a new timestamp)")
+    scrape.add_argument("--full", action="store_true", help="Write every scraped review, not only new ones")
+    scrape.set_defaults(handler=_scrape)
+
+    analyze = commands.add_parser("analyze", help="Run sentiment, keywords, dedup and clustering on scraped reviews")
+    source = analyze.add_mutually_exclusive_group(required=True)
+    source.add_argument("--run-id", help="Spider run to analyze")
+    source.add_argument("--csv", help="Legacy CSV export to analyze instead")
+    analyze.add_argument("--chunk-size", type=int, default=50_000)
+    analyze.add_argument("--n-clusters", help='Cluster count, or "auto" (default: keep the saved model\'s, 4 on the first fit)')
+    analyze.add_argument("--refit", action="store_true", help="Refit the cluster model")
+    analyze.add_argument("--sentiment-engine", choices=["lexicon", "textblob"], default="lexicon")
+    analyze.add_argument("--dedup-threshold", type=float, help="Near-duplicate Jaccard threshold (default 0.8)")
+    analyze.set_defaults(handler=_analyze)
+
+    report = commands.add_parser("report", help="Write the cross-bank comparison report")
+    report.add_argument("--format", choices=["html", "md"], default="html")
+    report.add_argument("--output", help="Report path (default: outputs/reports/comparison_<timestamp>.<format>)")
+    report.add_argument("--bank", action="append", help="Only this bank (repeatable)")
+    report.add_argument("--source", action="append", choices=["Apple", "Google"], help="Only this store (repeatable)")
+    report.add_argument("--since", help="Only reviews scraped on or after this date (YYYY-MM-DD)")
+    report.add_argument("--raw", action="store_true", help="Count near-duplicates individually")
+    report.add_argument("--resamples", type=int, default=1000, help="Bootstrap resamples")
+    report.set_defaults(handler=_report)
+
+    dashboard = commands.add_parser("dashboard", help="Serve the CSAT dashboard (needs Streamlit)")
+    dashboard.add_argument("--data", help="Analysis dataset directory or CSV (default: outputs/dataset/analysis)")
+    dashboard.add_argument("--port", type=int, default=8501)
+    dashboard.set_defaults(handler=_dashboard)
+
+    run_all = commands.add_parser("run-all", help="Scrape, analyze and report; interactive without --config")
+    run_all.add_argument("--config", help="Run unattended over the banks in this YAML config")
+    run_all.set_defaults(handler=_run_all)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        # No command: the interactive assistant, or a batch run with the old --config flag
+        args.handler = _run_all
+    try:
+        args.handler(args)
+    except ImportError as e:
+        # A component whose dependencies are not installed
+        sys.exit(f"[MAISTRO agent] ❌ `{args.command or 'run-all'}` needs the '{e.name}' package "
+                 f"(pip install -r requirements.txt)")
 
 if __name__ == "__main__":
-    print("Hello, I am OrYx Maistro (LangGraph Orchestrator Agent). How can I help you?\n")
-    OrYxMaistroAgent()
+    main()
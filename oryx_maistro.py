@@ -1,9 +1,12 @@
-from ai_ml_agent import run_aiml_models_on_file
-from oryx_spider import run_spider_on_bank
-from devops_agent import launch_dashboard
-import pandas as pd
-import os
-from datetime import datetime
+from oryx_spider import run_spider_on_banks, set_max_concurrency, MAX_CONCURRENCY
+from run_metrics import new_run_id, start_run, write_run_metrics
+import yaml
+
+# The AI/ML stack (pandas, scikit-learn, TextBlob), the report and LangGraph are
+# imported inside the steps that use them, so scraping starts without them
+
+# Keys a bank entry in the batch config must set (everything else has a default)
+REQUIRED_BANK_KEYS = ["bank_name", "apple_id", "google_package"]
 
 def OrYxMaistroAgent():
     print("\n[MAISTRO agent] SYSTEM_PROMPT:\n You are the OrYx Models Master Developer — a LangGraph AI Orchestrator.")
@@ -12,7 +15,7 @@ def OrYxMaistroAgent():
     print("[MAISTRO agent] 💬 Your request: scrape user review data from app store and play store for banks in oman and create a comparison report")
     print("[MAISTRO agent] Understood! Let's proceed with a guided setup.\n")
 
-    all_reviews = []
+    banks = []
 
     while True:
         bank_name = input("🔹 Bank name (e.g., Sohar International): ").strip()
@@ -23,8 +26,7 @@ def OrYxMaistroAgent():
         play_lang = input("🔹 Play Store language code (default 'en'): ").strip() or "en"
         review_count = input("🔹 How many reviews per store? (default 100): ").strip() or "100"
 
-        print(f"\n[MAISTRO agent] Assigning scraping to Dave (Oryx Spider)...\n")
-        csv_path, bank_df = run_spider_on_bank(
+        banks.append(dict(
             bank_name=bank_name,
             apple_id=apple_id,
             google_package=play_package,  # ✅ FIXED
@@ -32,26 +34,117 @@ def OrYxMaistroAgent():
             google_country=playstore_country,
             google_lang=play_lang,
             max_reviews=int(review_count)
-        )
-
-        all_reviews.append(bank_df)
+        ))
 
         cont = input("\nDo you want to scrape reviews for another bank? (yes/no): ").strip().lower()
         if cont != "yes":
             break
 
-    final_df = pd.concat(all_reviews, ignore_index=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    combined_path = f"outputs/combined_reviews_{timestamp}.csv"
-    final_df.to_csv(combined_path, index=False)
-    print(f"\n[MAISTRO agent] ✅ Combined CSV saved to {combined_path}")
+    # All banks are scraped concurrently once the list is complete
+    print(f"\n[MAISTRO agent] Assigning scraping of {len(banks)} bank(s) to Dave (Oryx Spider)...\n")
+    # Every bank of this run shares one run ID in the reviews dataset
+    run_id = new_run_id()
+    start_run(run_id)
+    # Reviews stream into the dataset as they are scraped; only counts come back
+    results = run_spider_on_banks([dict(bank, run_id=run_id) for bank in banks])
+
+    total = sum(sum(written.values()) for _, written in results)
+    if not total:
+        print("\n[MAISTRO agent] 💤 No new reviews since the last run, nothing to analyze.\n")
+        write_run_metrics(run_id)
+        return
+
+    print(f"\n[MAISTRO agent] ✅ {total} reviews stored for run {run_id}")
 
     print(f"\n[MAISTRO agent] Assigning AI/ML modeling to Al (Oryx AI Scientist)...\n")
-    ai_output_path = run_aiml_models_on_file(combined_path)
+    from ai_ml_agent import run_aiml_models_on_run
+    ai_output_path = run_aiml_models_on_run(run_id)
+
+    print(f"\n[MAISTRO agent] Writing the cross-bank comparison report...\n")
+    from comparison_report import write_comparison_report
+    report_path = write_comparison_report()
+    write_run_metrics(run_id)
+    if report_path:
+        print(f"[MAISTRO agent] 📑 Comparison report: {report_path}")
 
     deploy = input("\nDo you want to deploy the dashboard with the results? (yes/no): ").strip().lower()
     if deploy == "yes":
         print(f"\n[MAISTRO agent] Assigning deployment to Dave (DevOps Agent)...\n")
+        from devops_agent import launch_dashboard
         launch_dashboard(ai_output_path)
 
     print("\n[MAISTRO agent] ✅ All tasks complete!\n")
+
+def load_batch_config(config_path):
+    # YAML with a "banks" list; "defaults" fill in keys a bank entry leaves out
+    with open(config_path, encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+    defaults = config.get("defaults") or {}
+    banks = []
+    for i, entry in enumerate(config.get("banks") or []):
+        bank = dict(defaults, **entry)
+        missing = [k for k in REQUIRED_BANK_KEYS if not bank.get(k)]
+        if missing:
+            raise ValueError(f"{config_path}: bank #{i + 1} is missing {', '.join(missing)}")
+        bank["apple_id"] = str(bank["apple_id"])
+        bank["max_reviews"] = int(bank.get("max_reviews", 100))
+        banks.append(bank)
+    if not banks:
+        raise ValueError(f"{config_path}: no banks configured")
+    return banks, config.get("max_concurrency")
+
+def _run_without_graph(banks, run_id):
+    # Same steps as the LangGraph pipeline, for installs without langgraph
+    from ai_ml_agent import run_aiml_models_on_run
+    from comparison_report import write_comparison_report
+
+    results = run_spider_on_banks([dict(bank, run_id=run_id) for bank in banks])
+    lines, total = [], 0
+    for bank, (_, written) in zip(banks, results):
+        count = sum(written.values())
+        total += count
+        lines.append(f"{bank['bank_name']}: {count} new (Apple: {written.get('Apple', 0)}, Google: {written.get('Google', 0)})")
+    result = {"review_count": total, "summary": f"Scraped {total} new reviews for run {run_id}.\n" + "\n".join(lines)}
+    if total:
+        result["ai_ml_output_file"] = run_aiml_models_on_run(run_id)
+        result["report_file"] = write_comparison_report()
+    return result
+
+def run_batch(config_path):
+    # Unattended run over every bank in the config: one parallel scrape branch
+    # per bank in the LangGraph pipeline, joined before the AI/ML stage
+    banks, max_concurrency = load_batch_config(config_path)
+    if max_concurrency:
+        set_max_concurrency(max_concurrency)
+    print(f"\n[MAISTRO agent] 📋 Batch run over {len(banks)} bank(s) from {config_path}\n")
+
+    try:
+        from graph_builder import build_maistro_graph
+    except ImportError as e:
+        if (e.name or "").split(".")[0] not in ("langgraph", "langchain_core"):
+            raise
+        print(f"[MAISTRO agent] ⚠️ {e.name} is not installed, running the stages one after another")
+        build_maistro_graph = None
+
+    run_id = new_run_id()
+    start_run(run_id)
+    try:
+        if build_maistro_graph is None:
+            result = _run_without_graph(banks, run_id)
+        else:
+            result = build_maistro_graph().invoke(
+                {"banks": banks, "run_id": run_id},
+                config={"max_concurrency": max_concurrency or MAX_CONCURRENCY},
+            )
+    finally:
+        write_run_metrics(run_id)
+
+    print(f"\n[MAISTRO agent] {result['summary']}")
+    if result.get("ai_ml_output_file"):
+        print(f"[MAISTRO agent] 📊 Analysis written to {result['ai_ml_output_file']}")
+        if result.get("report_file"):
+            print(f"[MAISTRO agent] 📑 Comparison report: {result['report_file']}")
+    else:
+        print("[MAISTRO agent] 💤 No new reviews since the last run, nothing to analyze.")
+    print("\n[MAISTRO agent] ✅ Batch run complete!\n")
+    return result
@@ -1,107 +1,432 @@
 import os
+import math
+import time
+import threading
 import requests
-import pandas as pd
-from datetime import datetime
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from google_play_scraper import reviews as gp_reviews
+from google_play_scraper.features.reviews import _ContinuationToken
 import xml.etree.ElementTree as ET
+from review_store import REVIEW_STORE_PATH, review_key, known_review_ids, add_reviews
+from run_metrics import instrumented, stage, count_request, new_run_id
+from crawl_scheduler import with_retries, backoff_delay, host_of, load_checkpoint, save_checkpoint
 
 OUTPUT_DIR = "outputs"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def fetch_apple_reviews(app_id, country='us', max_reviews=100):
-    reviews = []
-    page = 1
-    while len(reviews) < max_reviews:
-        url = f"https://itunes.apple.com/{country}/rss/customerreviews/page={page}/id={app_id}/sortby=mostrecent/xml"
-        print(f"[SPIDER] Fetching Apple RSS page {page} → {url}")
-        response = requests.get(url)
-        if response.status_code != 200:
-            print(f"[SPIDER] ❌ Error fetching Apple page {page}")
-            break
-
-        root = ET.fromstring(response.content)
-        entries = root.findall(".//{http://www.w3.org/2005/Atom}entry")
-
-        # First entry is usually app metadata, skip it
-        if page == 1 and entries:
-            entries = entries[1:]
-
-        if not entries:
-            print(f"[SPIDER] ❌ No more reviews or error at page {page}.")
-            break
-
-        for entry in entries:
-            author = entry.find("{http://www.w3.org/2005/Atom}author")
-            name = author.find("{http://www.w3.org/2005/Atom}name").text if author is not None else ""
-            title = entry.find("{http://www.w3.org/2005/Atom}title").text
-            content = entry.find("{http://www.w3.org/2005/Atom}content").text
-            rating = entry.find("{http://itunes.apple.com/rss}rating")
-            reviews.append({
-                "source": "Apple",
-                "author": name,
-                "title": title,
-                "review_text": content,
-                "rating": int(rating.text) if rating is not None else None
-            })
-
-        if len(entries) < 50:
-            break
-        page += 1
-
-    return reviews[:max_reviews]
-
-def fetch_google_reviews(package_name, lang='en', country='us', max_reviews=100):
-    result, _ = gp_reviews(
-        package_name,
-        lang=lang,
-        country=country,
-        count=max_reviews,
-        filter_score_with=None
-    )
+# Concurrency limit shared by page fetches and per-bank fan-out (override with ORYX_MAX_CONCURRENCY)
+MAX_CONCURRENCY = int(os.environ.get("ORYX_MAX_CONCURRENCY", "8"))
+
+# Customer-reviews RSS host (override with ORYX_APPLE_RSS_URL, e.g. a local stand-in for benchmarks)
+APPLE_RSS_URL = os.environ.get("ORYX_APPLE_RSS_URL", "https://itunes.apple.com").rstrip("/")
+
+# The customer-reviews RSS feed serves at most 10 pages of 50 reviews
+APPLE_PAGE_SIZE = 50
+APPLE_MAX_PAGES = 10
+
+# Google Play reviews are paged through the continuation token in batches of this size
+GOOGLE_BATCH_SIZE = 200
+# Older Google Play reviews fetched per run from the saved continuation token
+GOOGLE_HISTORY_REVIEWS = 1000
+
+# Reviews are stored and written to the dataset this many at a time per store,
+# so memory does not grow with the number of reviews scraped
+WRITE_CHUNK_SIZE = 1000
+
+_session_local = threading.local()
+_request_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+def set_max_concurrency(limit):
+    # Caps the number of store requests in flight across all threads
+    global MAX_CONCURRENCY, _request_slots
+    MAX_CONCURRENCY = max(1, int(limit))
+    _request_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+def _get_session():
+    # One keep-alive session per worker thread, each backed by a connection pool
+    session = getattr(_session_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=MAX_CONCURRENCY, pool_maxsize=MAX_CONCURRENCY)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session_local.session = session
+    return session
+
+def _fetch_apple_page(app_id, country, page):
+    url = f"{APPLE_RSS_URL}/{country}/rss/customerreviews/page={page}/id={app_id}/sortby=mostrecent/xml"
+    print(f"[SPIDER] Fetching Apple RSS page {page} → {url}")
+
+    def attempt():
+        try:
+            with _request_slots:
+                response = _get_session().get(url, timeout=30)
+        except requests.RequestException:
+            count_request("spider.apple_reviews")
+            raise
+        count_request("spider.apple_reviews", len(response.content))
+        return response
+
+    # Rate limited per host; 429/5xx and connection errors are retried with backoff
+    try:
+        response = with_retries(attempt, host_of(url), f"Apple page {page}", retry_on=(requests.RequestException,))
+    except requests.RequestException as e:
+        print(f"[SPIDER] ❌ Error fetching Apple page {page}: {e}")
+        return None
+    if response.status_code != 200:
+        return None
+    return response.content
+
+def _utc_timestamp(value):
+    # Review time as "YYYY-MM-DDTHH:MM:SSZ": Apple's <updated> carries an offset,
+    # google_play_scraper's `at` is a naive local datetime
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _parse_apple_entries(content, page, app_id):
+    root = ET.fromstring(content)
+    entries = root.findall(".//{http://www.w3.org/2005/Atom}entry")
+
+    # First entry is usually app metadata, skip it
+    if page == 1 and entries:
+        entries = entries[1:]
 
     reviews = []
-    for r in result:
+    for entry in entries:
+        author = entry.find("{http://www.w3.org/2005/Atom}author")
+        name = author.find("{http://www.w3.org/2005/Atom}name").text if author is not None else ""
+        title = entry.find("{http://www.w3.org/2005/Atom}title").text
+        content = entry.find("{http://www.w3.org/2005/Atom}content").text
+        rating = entry.find("{http://itunes.apple.com/rss}rating")
+        native_id = entry.find("{http://www.w3.org/2005/Atom}id")
+        updated = entry.find("{http://www.w3.org/2005/Atom}updated")
         reviews.append({
-            "source": "Google",
-            "author": r['userName'],
-            "title": "",
-            "review_text": r['content'],
-            "rating": r['score']
+            "source": "Apple",
+            "author": name,
+            "title": title,
+            "review_text": content,
+            "rating": int(rating.text) if rating is not None else None,
+            "review_id": review_key("Apple", app_id, name, content, native_id.text if native_id is not None else None),
+            "app_id": str(app_id),
+            "review_date": _utc_timestamp(updated.text if updated is not None else None)
         })
     return reviews
 
-def run_spider_on_bank(bank_name, apple_id, google_package, apple_country='us', google_country='us', google_lang='en', max_reviews=100):
+def _take_until_known(reviews, store_path):
+    # Feeds are newest first: everything from the first stored review onwards is old
+    if not store_path or not reviews:
+        return reviews, False
+    known = known_review_ids([r["review_id"] for r in reviews], db_path=store_path)
+    for i, r in enumerate(reviews):
+        if r["review_id"] in known:
+            return reviews[:i], True
+    return reviews, False
+
+def _drop_known(reviews, store_path):
+    if not store_path or not reviews:
+        return reviews
+    known = known_review_ids([r["review_id"] for r in reviews], db_path=store_path)
+    return [r for r in reviews if r["review_id"] not in known]
+
+@instrumented("spider.apple_reviews", rows_out=lambda page: len(page[0]))
+def iter_apple_pages(app_id, country='us', max_reviews=100, store_path=None, start_page=1):
+    # Yields (reviews, resume_page) per RSS page, newest first. resume_page is
+    # where an interrupted crawl picks up, None once the crawl is complete.
+    pages = min(APPLE_MAX_PAGES, max(1, math.ceil(max_reviews / APPLE_PAGE_SIZE)))
+
+    # Fetch the pages we may need at once, then walk them in order so the
+    # stopping rules (error, empty page, short page) match the serial crawl.
+    # Incremental runs look at page 1 alone first, since a daily refresh
+    # usually reaches stored reviews there. A resumed crawl skips stored
+    # reviews instead of stopping at them, since pages shift as reviews arrive.
+    resumed = start_page > 1
+    if resumed:
+        waves = [list(range(start_page, pages + 1))]
+    elif store_path:
+        waves = [[1], list(range(2, pages + 1))]
+    else:
+        waves = [list(range(1, pages + 1))]
+
+    if start_page > pages:
+        # The checkpoint is past what this crawl would fetch
+        yield [], None
+        return
+
+    # Pages before the checkpoint count towards max_reviews
+    yielded = (start_page - 1) * APPLE_PAGE_SIZE
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENCY, pages)) as pool:
+        for wave in waves:
+            if not wave:
+                break
+            contents = list(pool.map(lambda p: _fetch_apple_page(app_id, country, p), wave))
+
+            for page, content in zip(wave, contents):
+                if content is None:
+                    # Left unfinished: the next run resumes at this page
+                    print(f"[SPIDER] ❌ Error fetching Apple page {page}")
+                    return
+
+                entries = _parse_apple_entries(content, page, app_id)
+                if not entries:
+                    print(f"[SPIDER] ❌ No more reviews or error at page {page}.")
+                    yield [], None
+                    return
+
+                if resumed:
+                    new_entries, reached_known = _drop_known(entries, store_path), False
+                else:
+                    new_entries, reached_known = _take_until_known(entries, store_path)
+                new_entries = new_entries[:max_reviews - yielded]
+                yielded += len(new_entries)
+                if reached_known:
+                    print(f"[SPIDER] ⏹️ Reached stored Apple reviews at page {page}")
+                finished = reached_known or len(entries) < APPLE_PAGE_SIZE or yielded >= max_reviews or page >= pages
+                yield new_entries, None if finished else page + 1
+                if finished:
+                    return
+
+def iter_apple_reviews(app_id, country='us', max_reviews=100, store_path=None):
+    for reviews, _ in iter_apple_pages(app_id, country=country, max_reviews=max_reviews, store_path=store_path):
+        yield from reviews
+
+def fetch_apple_reviews(app_id, country='us', max_reviews=100, store_path=None):
+    return list(iter_apple_reviews(app_id, country=country, max_reviews=max_reviews, store_path=store_path))
+
+def _google_record(r, package_name):
+    return {
+        "source": "Google",
+        "author": r['userName'],
+        "title": "",
+        "review_text": r['content'],
+        "rating": r['score'],
+        "review_id": review_key("Google", package_name, r['userName'], r['content'], r.get('reviewId')),
+        "app_id": package_name,
+        "review_date": _utc_timestamp(r.get('at'))
+    }
+
+def _token_cursor(token):
+    # Continuation token as plain JSON for checkpoints; None when there is nothing left
+    if token is None or token.token is None:
+        return None
+    return {
+        "token": token.token, "lang": token.lang, "country": token.country, "sort": token.sort,
+        "count": token.count, "filter_score_with": token.filter_score_with,
+        "filter_device_with": token.filter_device_with,
+    }
+
+# google_play_scraper swallows HTTP errors (429 included) and returns an empty
+# batch, so empty batches get a few quick retries of their own: on the first
+# page an app with no Google reviews should not wait out the full backoff, and
+# after it an empty batch is almost always the end of history
+GOOGLE_EMPTY_FIRST_RETRIES = 2
+GOOGLE_EMPTY_BATCH_RETRIES = 1
+
+@instrumented("spider.google_reviews", rows_out=lambda page: len(page[0]))
+def iter_google_pages(package_name, lang='en', country='us', max_reviews=100, store_path=None, resume_cursor=None,
+                      then_cursor=None):
+    # Yields (reviews, cursor) per continuation-token batch, newest first. cursor
+    # is where older reviews continue: the live token while paging or once
+    # max_reviews is reached, then_cursor (the saved history position) when the
+    # crawl meets stored reviews, None when Google has nothing older.
+    yielded = 0
+    token = _ContinuationToken(**resume_cursor) if resume_cursor else None
+    resumed = token is not None
+    first = True
+
+    def attempt(token, count):
+        with _request_slots:
+            # google_play_scraper does not expose response sizes, so only requests are counted
+            count_request("spider.google_reviews")
+            if token is None:
+                return gp_reviews(
+                    package_name,
+                    lang=lang,
+                    country=country,
+                    count=count,
+                    filter_score_with=None
+                )
+            # Never fetch past max_reviews: the token moves on after the whole
+            # batch, so anything cut off here would be skipped for good
+            token.count = count
+            return gp_reviews(package_name, continuation_token=token)
+
+    def fetch(token, count, empty_retries):
+        # Network errors go through the scheduler's backoff, empty batches through empty_retries
+        for retry in range(empty_retries + 1):
+            result, next_token = with_retries(lambda: attempt(token, count), "play.google.com",
+                                              f"Google reviews for {package_name}", retry_on=(OSError,))
+            if result:
+                return result, next_token
+            if retry < empty_retries:
+                delay = backoff_delay(retry)
+                print(f"[SPIDER] ⚠️ Empty Google batch for {package_name}, retry {retry + 1}/{empty_retries} in {delay:.1f}s")
+                time.sleep(delay)
+        return [], None
+
+    # Page through the newest reviews in batches so an incremental run can
+    # stop as soon as it reaches reviews that are already stored
+    while yielded < max_reviews:
+        requested = min(GOOGLE_BATCH_SIZE, max_reviews - yielded)
+        last_good = _token_cursor(token) if token is not None else then_cursor
+        try:
+            result, token = fetch(token, requested, GOOGLE_EMPTY_FIRST_RETRIES if first else GOOGLE_EMPTY_BATCH_RETRIES)
+        except OSError as e:
+            print(f"[SPIDER] ❌ Google Play stopped answering for {package_name}: {e.__class__.__name__}")
+            return
+        if not result:
+            if not first:
+                yield [], None
+            elif resumed:
+                # Left unfinished: the next run resumes from the saved token
+                print(f"[SPIDER] ⏹️ No older Google Play reviews returned for {package_name}; keeping the saved token")
+            else:
+                print(f"[SPIDER] ⏹️ No Google Play reviews for {package_name}")
+            return
+        first = False
+
+        records = [_google_record(r, package_name) for r in result]
+        if resumed:
+            batch, reached_known = _drop_known(records, store_path), False
+        else:
+            batch, reached_known = _take_until_known(records, store_path)
+        batch = batch[:max_reviews - yielded]
+        yielded += len(batch)
+        if reached_known:
+            print(f"[SPIDER] ⏹️ Reached stored Google reviews after {yielded} new")
+        cursor = then_cursor if reached_known else _token_cursor(token)
+        cut_off = cursor is None and len(result) >= requested
+        if cut_off:
+            # google_play_scraper also turns a failed fetch into a missing token; after
+            # a full batch that is a cut-off crawl, not the end, so the checkpoint stays
+            print(f"[SPIDER] ⚠️ Google Play dropped the continuation token for {package_name}; keeping the last cursor")
+            cursor = last_good
+        yield batch, cursor
+        if reached_known or cut_off or cursor is None or yielded >= max_reviews:
+            return
+
+def _google_page_stream(package_name, lang, country, max_reviews, history_reviews, stop_at, store_path, cursor):
+    # Newest reviews until stored ones, then, when an earlier run saved a token,
+    # up to history_reviews older ones from wherever the history now continues
+    last = cursor
+    for batch, last in iter_google_pages(package_name, lang=lang, country=country, max_reviews=max_reviews,
+                                         store_path=stop_at, then_cursor=cursor):
+        yield batch, last
+    if cursor and last and history_reviews:
+        print(f"[SPIDER] 📜 Extending Google Play history for {package_name} by up to {history_reviews} reviews")
+        yield from iter_google_pages(package_name, max_reviews=history_reviews, store_path=store_path, resume_cursor=last)
+
+def iter_google_reviews(package_name, lang='en', country='us', max_reviews=100, store_path=None):
+    for reviews, _ in iter_google_pages(package_name, lang=lang, country=country, max_reviews=max_reviews, store_path=store_path):
+        yield from reviews
+
+def fetch_google_reviews(package_name, lang='en', country='us', max_reviews=100, store_path=None):
+    return list(iter_google_reviews(package_name, lang=lang, country=country, max_reviews=max_reviews, store_path=store_path))
+
+def _store_chunk(chunk, bank_name, source, part, run_id, incremental, store_path):
+    # Returns how many reviews were written to the dataset
+    for r in chunk:
+        r['bank'] = bank_name
+    with stage("spider.store_and_write", rows_in=len(chunk)) as s:
+        # Record everything in the review store; incremental runs pass on only unseen rows
+        new_reviews = add_reviews(chunk, db_path=store_path)
+        rows = new_reviews if incremental else chunk
+        if rows:
+            # pandas / pyarrow load on the first write, so a scrape starts without them
+            import pandas as pd
+            from review_dataset import write_reviews
+            df = pd.DataFrame(rows)
+            df['review_text'] = df['review_text'].fillna("").astype(str)
+            write_reviews(df, "reviews", run_id=run_id, part=f"{source.lower()}{part}")
+        s.rows_out = len(rows)
+    return len(rows)
+
+def _write_review_stream(pages, bank_name, source, crawl_key, run_id, incremental, store_path, chunk_size=WRITE_CHUNK_SIZE):
+    # Stores and writes one store's page stream about chunk_size reviews at a time.
+    # Once a chunk is written its resume cursor is checkpointed, so an interrupted
+    # crawl restarts after the last page that is safely stored.
+    # Returns (reviews collected, reviews written to the dataset)
+    collected = written = part = 0
+    chunk, pending = [], False
+    cursor = None
+    for reviews, cursor in pages:
+        collected += len(reviews)
+        chunk.extend(reviews)
+        pending = True
+        if len(chunk) >= chunk_size:
+            written += _store_chunk(chunk, bank_name, source, part, run_id, incremental, store_path)
+            save_checkpoint(source, *crawl_key, cursor, run_id=run_id, db_path=store_path)
+            chunk, pending, part = [], False, part + 1
+    if pending:
+        if chunk:
+            written += _store_chunk(chunk, bank_name, source, part, run_id, incremental, store_path)
+        save_checkpoint(source, *crawl_key, cursor, run_id=run_id, db_path=store_path)
+    return collected, written
+
+def run_spider_on_bank(bank_name, apple_id, google_package, apple_country='us', google_country='us', google_lang='en', max_reviews=100, incremental=True, store_path=REVIEW_STORE_PATH, run_id=None, google_history_reviews=GOOGLE_HISTORY_REVIEWS):
+    # Returns (run_id, {source: reviews written}); the reviews themselves go
+    # straight to the "reviews" dataset, partitioned by bank / source / scrape date
     print(f"\n[SPIDER] 🚀 Starting review scraping for: {bank_name}")
+    # Incremental runs stop paging at stored reviews and only return new ones
+    stop_at = store_path if incremental else None
+    run_id = run_id or new_run_id()
 
     print(f"[SPIDER] 🛒 Scraping Apple App Store reviews for App ID: {apple_id} (Country: {apple_country})")
-    apple_reviews = fetch_apple_reviews(apple_id, country=apple_country, max_reviews=max_reviews)
-    print(f"[SPIDER] ✅ Collected {len(apple_reviews)} reviews from Apple")
-
     print(f"[SPIDER] 🤖 Scraping Google Play reviews for Package: {google_package} (Lang: {google_lang}, Country: {google_country})")
-    google_reviews = fetch_google_reviews(google_package, lang=google_lang, country=google_country, max_reviews=max_reviews)
-    print(f"[SPIDER] ✅ Collected {len(google_reviews)} reviews from Google Play")
 
-    # Normalize and convert to DataFrame
-    def safe_reviews_to_df(reviews):
-        df = pd.DataFrame(reviews)
-        if 'review_text' not in df.columns:
-            df['review_text'] = ''
-        df['review_text'] = df['review_text'].fillna("").astype(str)
-        return df
+    # Interrupted Apple crawls resume from their checkpoint. For Google the
+    # checkpoint is the continuation token where older reviews pick up, so an
+    # interrupted crawl resumes and later runs extend the history from it
+    apple_key = (str(apple_id), apple_country)
+    google_key = (google_package, f"{google_country}:{google_lang}")
+    apple_page = load_checkpoint("Apple", *apple_key, db_path=store_path) or 1
+    google_cursor = load_checkpoint("Google", *google_key, db_path=store_path)
+    if apple_page > 1:
+        print(f"[SPIDER] ⏯️ Resuming the Apple crawl at page {apple_page}")
 
-    apple_df = safe_reviews_to_df(apple_reviews)
-    google_df = safe_reviews_to_df(google_reviews)
+    # Both stores are scraped at the same time, each streaming into the dataset
+    streams = {
+        "Apple": (apple_key, lambda: iter_apple_pages(apple_id, country=apple_country, max_reviews=max_reviews,
+                                                      store_path=stop_at, start_page=apple_page)),
+        "Google": (google_key, lambda: _google_page_stream(google_package, google_lang, google_country, max_reviews,
+                                                           google_history_reviews, stop_at, store_path, google_cursor)),
+    }
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = {
+            source: pool.submit(lambda key=key, pages=pages, source=source: _write_review_stream(
+                pages(), bank_name, source, key, run_id, incremental, store_path))
+            for source, (key, pages) in streams.items()
+        }
+        results = {source: f.result() for source, f in futures.items()}
 
-    # Add bank name
-    apple_df['bank'] = bank_name
-    google_df['bank'] = bank_name
+    print(f"[SPIDER] ✅ Collected {results['Apple'][0]} reviews from Apple")
+    print(f"[SPIDER] ✅ Collected {results['Google'][0]} reviews from Google Play")
 
-    combined_df = pd.concat([apple_df, google_df], ignore_index=True)
+    written = {source: w for source, (_, w) in results.items()}
+    total = sum(written.values())
+    if incremental:
+        print(f"[SPIDER] 🆕 {total} of them are new to the review store")
+    if not total:
+        print(f"\n[SPIDER] 💤 No new reviews for {bank_name}")
+    else:
+        from review_dataset import stage_path
+        print(f"\n[SPIDER] 📦 Saved {total} reviews to {stage_path('reviews')} (run {run_id})")
+    return run_id, written
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{bank_name.lower().replace(' ', '_')}_reviews_{timestamp}.csv"
-    filepath = os.path.join(OUTPUT_DIR, filename)
-    combined_df.to_csv(filepath, index=False)
+def run_spider_on_banks(banks, max_concurrency=None):
+    # banks: list of dicts with run_spider_on_bank keyword arguments
+    if max_concurrency:
+        set_max_concurrency(max_concurrency)
+    print(f"\n[SPIDER] 🕸️ Scraping {len(banks)} banks (max {MAX_CONCURRENCY} requests in flight)")
 
-    print(f"\n[SPIDER] 📦 Saved {len(combined_df)} reviews to {filepath}")
-    return filepath, combined_df
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENCY, len(banks)))) as pool:
+        futures = [pool.submit(run_spider_on_bank, **bank) for bank in banks]
+        # Keep results in the order the banks were given
+        return [f.result() for f in futures]
@@ -0,0 +1,241 @@
+import os
+import re
+import sys
+import glob
+import hashlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from datetime import datetime
+from run_metrics import new_run_id
+
+DATASET_DIR = os.path.join("outputs", "dataset")
+
+# Hand-offs between stages: "reviews" is the spider output, "analysis" the AI/ML output
+PARTITION_FIELDS = [
+    pa.field("bank", pa.string()),
+    pa.field("source", pa.string()),
+    pa.field("scrape_date", pa.string()),
+]
+
+REVIEW_FIELDS = [
+    pa.field("review_id", pa.string()),
+    pa.field("app_id", pa.string()),
+    pa.field("author", pa.string()),
+    pa.field("title", pa.string()),
+    pa.field("review_text", pa.string()),
+    pa.field("rating", pa.int8()),
+    pa.field("run_id", pa.string()),
+    # When the review was posted / last edited, "YYYY-MM-DDTHH:MM:SSZ" (UTC)
+    pa.field("review_date", pa.string()),
+]
+
+ANALYSIS_FIELDS = REVIEW_FIELDS + [
+    pa.field("sentiment", pa.float32()),
+    pa.field("top_keyword", pa.string()),
+    pa.field("cluster", pa.int32()),
+    pa.field("canonical_id", pa.string()),
+]
+
+# Loaded as pandas categoricals; ratings stay int8 (float32 if some are missing)
+CATEGORICAL_COLUMNS = ["bank", "source", "scrape_date"]
+
+STAGE_SCHEMAS = {
+    "reviews": pa.schema(REVIEW_FIELDS + PARTITION_FIELDS),
+    "analysis": pa.schema(ANALYSIS_FIELDS + PARTITION_FIELDS),
+}
+
+# Column names used by older CSV exports, mapped onto the dataset schema
+LEGACY_COLUMN_ALIASES = {
+    "bank": ["bank_name", "bankName"],
+    "source": ["store", "platform"],
+    "review_text": ["review", "content"],
+    "title": ["review_title"],
+    "author": ["user_name", "userName"],
+    "sentiment": ["sentiment_polarity", "sentiment_score"],
+    "top_keyword": ["keywords", "top_keywords", "review_keywords"],
+    "cluster": ["cluster_id"],
+    "review_date": ["at", "date", "updated"],
+}
+
+_PARTITIONING = ds.partitioning(pa.schema(PARTITION_FIELDS), flavor="hive")
+
+def stage_path(stage, root=DATASET_DIR):
+    if stage not in STAGE_SCHEMAS:
+        raise ValueError(f"Unknown dataset stage: {stage}")
+    return os.path.join(root, stage)
+
+def _to_table(df, stage, run_id, scrape_date):
+    schema = STAGE_SCHEMAS[stage]
+    df = df.copy()
+    if "run_id" not in df.columns or df["run_id"].isna().all():
+        df["run_id"] = run_id
+    if "scrape_date" not in df.columns:
+        df["scrape_date"] = scrape_date
+
+    # Columns outside the stage schema are dropped, missing ones become nulls
+    columns = {}
+    for field in schema:
+        values = df[field.name] if field.name in df.columns else pd.Series([None] * len(df))
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            values = pd.to_numeric(values, errors="coerce")
+            if pa.types.is_integer(field.type):
+                values = values.astype("Int64")
+        else:
+            values = values.astype(object).where(values.notna(), None)
+            values = values.map(lambda v: v if v is None else str(v))
+        columns[field.name] = pa.array(values, type=field.type, from_pandas=True)
+    return pa.table(columns, schema=schema)
+
+def write_reviews(df, stage, run_id=None, scrape_date=None, root=DATASET_DIR, part=None):
+    # part tells apart the chunks of one run that land in the same partition
+    run_id = run_id or new_run_id()
+    scrape_date = scrape_date or datetime.now().strftime("%Y-%m-%d")
+    path = stage_path(stage, root)
+    if df.empty:
+        return path
+
+    ds.write_dataset(
+        _to_table(df, stage, run_id, scrape_date),
+        path,
+        format="parquet",
+        partitioning=_PARTITIONING,
+        basename_template=f"{stage}-{run_id}-{{i}}.parquet" if part is None else f"{stage}-{run_id}-{part}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return path
+
+def open_dataset(stage, root=DATASET_DIR):
+    path = stage_path(stage, root)
+    if not os.path.isdir(path):
+        return None
+    return ds.dataset(path, schema=STAGE_SCHEMAS[stage], format="parquet", partitioning=_PARTITIONING)
+
+def _filter_expression(banks=None, sources=None, run_id=None, min_rating=None, max_rating=None, since=None,
+                       review_ids=None):
+    expr = None
+
+    def _and(e):
+        nonlocal expr
+        expr = e if expr is None else expr & e
+
+    if banks is not None:
+        _and(ds.field("bank").isin(list(banks)))
+    if sources is not None:
+        _and(ds.field("source").isin(list(sources)))
+    if run_id is not None:
+        _and(ds.field("run_id") == run_id)
+    if min_rating is not None:
+        _and(ds.field("rating") >= min_rating)
+    if max_rating is not None:
+        _and(ds.field("rating") <= max_rating)
+    if since is not None:
+        _and(ds.field("scrape_date") >= since)
+    if review_ids is not None:
+        _and(ds.field("review_id").isin(list(review_ids)))
+    return expr
+
+def _to_frame(table):
+    df = table.to_pandas(categories=[c for c in CATEGORICAL_COLUMNS if c in table.column_names])
+    if "rating" in df.columns and df["rating"].dtype == np.float64:
+        df["rating"] = df["rating"].astype(np.float32)
+    return df
+
+def read_reviews(stage, columns=None, banks=None, sources=None, run_id=None, min_rating=None, max_rating=None, since=None,
+                 limit=None, root=DATASET_DIR, review_ids=None):
+    # Partition filters prune whole directories; the rest is pushed into the parquet scan
+    dataset = open_dataset(stage, root)
+    if dataset is None:
+        return pd.DataFrame(columns=columns or STAGE_SCHEMAS[stage].names)
+    expr = _filter_expression(banks, sources, run_id, min_rating, max_rating, since, review_ids)
+    if limit is not None:
+        # Stops scanning once enough rows matched
+        return _to_frame(dataset.head(limit, columns=columns, filter=expr))
+    return _to_frame(dataset.to_table(columns=columns, filter=expr))
+
+def iter_reviews(stage, batch_size=50_000, columns=None, banks=None, sources=None, run_id=None, min_rating=None,
+                 max_rating=None, since=None, root=DATASET_DIR):
+    # Same filters as read_reviews, yielded as DataFrames of at most batch_size rows
+    dataset = open_dataset(stage, root)
+    if dataset is None:
+        return
+    expr = _filter_expression(banks, sources, run_id, min_rating, max_rating, since)
+    rows = []
+    pending = 0
+    for batch in dataset.to_batches(columns=columns, filter=expr, batch_size=batch_size):
+        if batch.num_rows == 0:
+            continue
+        rows.append(batch)
+        pending += batch.num_rows
+        if pending >= batch_size:
+            table = pa.Table.from_batches(rows)
+            yield _to_frame(table.slice(0, batch_size))
+            rest = table.slice(batch_size)
+            rows, pending = rest.to_batches(), rest.num_rows
+    if pending:
+        yield _to_frame(pa.Table.from_batches(rows))
+
+def dataset_version(stage, root=DATASET_DIR):
+    # Changes whenever a file is added or rewritten; used as a cache key by readers
+    path = stage_path(stage, root)
+    files = []
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            stat = os.stat(os.path.join(dirpath, name))
+            files.append((name, stat.st_size, stat.st_mtime_ns))
+    return hashlib.sha1(repr(sorted(files)).encode("utf-8")).hexdigest()[:16]
+
+def partition_values(stage, field, root=DATASET_DIR):
+    # Distinct bank / source / scrape_date values, read from the directory layout only
+    dataset = open_dataset(stage, root)
+    if dataset is None:
+        return []
+    values = set()
+    for fragment in dataset.get_fragments():
+        keys = ds.get_partition_keys(fragment.partition_expression)
+        if keys.get(field) is not None:
+            values.add(keys[field])
+    return sorted(values)
+
+def _scrape_date_from_name(csv_path):
+    match = re.search(r"_(\d{8})_\d{6}\.csv$", os.path.basename(csv_path))
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d").strftime("%Y-%m-%d")
+    return datetime.fromtimestamp(os.path.getmtime(csv_path)).strftime("%Y-%m-%d")
+
+def import_csv(csv_path, stage, root=DATASET_DIR):
+    try:
+        df = pd.read_csv(csv_path)
+    except pd.errors.EmptyDataError:
+        print(f"[DATASET] ⚠️ Skipping empty file {csv_path}")
+        return None
+    for column, aliases in LEGACY_COLUMN_ALIASES.items():
+        if column not in df.columns:
+            alias = next((a for a in aliases if a in df.columns), None)
+            if alias is not None:
+                df[column] = df[alias]
+    if "bank" not in df.columns:
+        df["bank"] = "Unknown Bank"
+    if "source" not in df.columns:
+        df["source"] = ""
+    if "review_text" in df.columns:
+        df["review_text"] = df["review_text"].fillna("").astype(str)
+    if "review_date" in df.columns:
+        dates = pd.to_datetime(df["review_date"], errors="coerce", utc=True)
+        df["review_date"] = dates.dt.strftime("%Y-%m-%dT%H:%M:%SZ").where(dates.notna(), None)
+
+    # Reuse the timestamp in the legacy file name as run and scrape date
+    run_id = os.path.splitext(os.path.basename(csv_path))[0]
+    write_reviews(df, stage, run_id=run_id, scrape_date=_scrape_date_from_name(csv_path), root=root)
+    print(f"[DATASET] 📥 Imported {len(df)} rows from {csv_path} into '{stage}'")
+    return run_id
+
+if __name__ == "__main__":
+    # python review_dataset.py <reviews|analysis> <csv files or globs>...
+    if len(sys.argv) < 3:
+        print("Usage: python review_dataset.py <reviews|analysis> <csv>...")
+        sys.exit(1)
+    for pattern in sys.argv[2:]:
+        for path in sorted(glob.glob(pattern)):
+            import_csv(path, sys.argv[1])
@@ -0,0 +1,144 @@
+import os
+import re
+import sys
+import hashlib
+import pandas as pd
+from review_dataset import DATASET_DIR, read_reviews
+from sentiment_engine import normalize_text
+from sqlite_db import connect
+
+REVIEW_INDEX_PATH = os.path.join(DATASET_DIR, "review_index.sqlite")
+
+# Columns returned by search_reviews, in order
+INDEX_COLUMNS = ["review_id", "bank", "source", "rating", "sentiment", "top_keyword", "cluster", "review_text"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_reviews (
+    rowid       INTEGER PRIMARY KEY,
+    review_id   TEXT NOT NULL UNIQUE,
+    bank        TEXT,
+    source      TEXT,
+    rating      INTEGER,
+    sentiment   REAL,
+    top_keyword TEXT,
+    cluster     INTEGER,
+    review_text TEXT,
+    canonical_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_indexed_filters ON indexed_reviews (bank, source, rating);
+CREATE VIRTUAL TABLE IF NOT EXISTS review_fts USING fts5(
+    body, content='', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+_QUERY_PART = re.compile(r'"([^"]+)"|(\S+)')
+
+def _connect(db_path=REVIEW_INDEX_PATH):
+    conn = connect(db_path, _SCHEMA)
+    # Indexes built before near-duplicates were tracked; their rows count as canonical until re-indexed
+    if "canonical_id" not in {row[1] for row in conn.execute("PRAGMA table_info(indexed_reviews)")}:
+        conn.execute("ALTER TABLE indexed_reviews ADD COLUMN canonical_id TEXT")
+    return conn
+
+def _row_key(row):
+    if isinstance(row.get("review_id"), str) and row["review_id"]:
+        return row["review_id"]
+    raw = f"{row.get('bank')}\x1f{row.get('source')}\x1f{row.get('author')}\x1f{row.get('review_text')}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def _none_if_nan(value):
+    return None if pd.isna(value) else value
+
+def index_reviews(df, db_path=REVIEW_INDEX_PATH):
+    # Adds new reviews to the full-text index; already indexed ones get their analysis columns refreshed
+    if df.empty:
+        return 0
+    conn = _connect(db_path)
+    added = 0
+    try:
+        with conn:
+            for row in df.to_dict("records"):
+                key = _row_key(row)
+                values = (
+                    _none_if_nan(row.get("bank")), _none_if_nan(row.get("source")),
+                    None if pd.isna(row.get("rating")) else int(row["rating"]),
+                    None if pd.isna(row.get("sentiment")) else float(row["sentiment"]),
+                    _none_if_nan(row.get("top_keyword")),
+                    None if pd.isna(row.get("cluster")) else int(row["cluster"]),
+                    _none_if_nan(row.get("canonical_id")),
+                )
+                cur = conn.execute(
+                    "UPDATE indexed_reviews SET bank = ?, source = ?, rating = ?, sentiment = ?, top_keyword = ?, cluster = ?, "
+                    "canonical_id = ? WHERE review_id = ?", values + (key,)
+                )
+                if cur.rowcount:
+                    continue
+                text = "" if pd.isna(row.get("review_text")) else str(row["review_text"])
+                cur = conn.execute(
+                    "INSERT INTO indexed_reviews "
+                    "(review_id, bank, source, rating, sentiment, top_keyword, cluster, canonical_id, review_text) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", (key,) + values + (text,)
+                )
+                # Index the same normalized form the query goes through (case, Arabic letter variants)
+                conn.execute("INSERT INTO review_fts (rowid, body) VALUES (?, ?)", (cur.lastrowid, normalize_text(text)))
+                added += 1
+    finally:
+        conn.close()
+    return added
+
+def build_match_query(query):
+    # Words must all match; "quoted text" is a phrase; a trailing * is a prefix match
+    terms = []
+    for phrase, word in _QUERY_PART.findall(query or ""):
+        text = normalize_text(phrase or word).replace('"', " ")
+        prefix = word.endswith("*") and not phrase
+        text = text.rstrip("*").strip()
+        if text:
+            terms.append(f'"{text}"' + ("*" if prefix else ""))
+    return " AND ".join(terms)
+
+def search_reviews(query="", banks=None, sources=None, rating_range=None, page=1, page_size=50, deduplicated=False,
+                   db_path=REVIEW_INDEX_PATH):
+    # One page of matching reviews (newest first) plus the total match count;
+    # deduplicated=True keeps only canonical reviews, as the deduplicated counts do
+    where, params = [], []
+    match = build_match_query(query)
+    if match:
+        where.append("r.rowid IN (SELECT rowid FROM review_fts WHERE review_fts MATCH ?)")
+        params.append(match)
+    if banks is not None:
+        where.append(f"r.bank IN ({','.join('?' * len(banks))})")
+        params.extend(banks)
+    if sources is not None:
+        where.append(f"r.source IN ({','.join('?' * len(sources))})")
+        params.extend(sources)
+    if rating_range is not None:
+        where.append("r.rating BETWEEN ? AND ?")
+        params.extend(rating_range)
+    if deduplicated:
+        where.append("(r.canonical_id IS NULL OR r.canonical_id = r.review_id)")
+    clause = f"WHERE {' AND '.join(where)}" if where else ""
+
+    conn = _connect(db_path)
+    try:
+        total = conn.execute(f"SELECT COUNT(*) FROM indexed_reviews r {clause}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT {', '.join('r.' + c for c in INDEX_COLUMNS)} FROM indexed_reviews r {clause} "
+            "ORDER BY r.rowid DESC LIMIT ? OFFSET ?",
+            params + [page_size, max(0, page - 1) * page_size]
+        ).fetchall()
+    finally:
+        conn.close()
+    return total, pd.DataFrame(rows, columns=INDEX_COLUMNS)
+
+def rebuild_index(root=DATASET_DIR, db_path=REVIEW_INDEX_PATH):
+    # Indexes everything already in the analysis dataset (e.g. after importing old CSVs)
+    df = read_reviews("analysis", columns=INDEX_COLUMNS + ["author", "canonical_id"], root=root)
+    added = index_reviews(df, db_path=db_path)
+    print(f"[INDEX] 🔎 Indexed {added} new reviews ({len(df)} scanned) into {db_path}")
+    return added
+
+if __name__ == "__main__":
+    # python review_index.py [dataset root]
+    root = sys.argv[1] if len(sys.argv) > 1 else DATASET_DIR
+    rebuild_index(root=root, db_path=os.path.join(root, "review_index.sqlite"))
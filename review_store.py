@@ -0,0 +1,74 @@
+import os
+import hashlib
+from datetime import datetime
+from sqlite_db import connect, select_in
+
+STORE_DIR = "outputs"
+REVIEW_STORE_PATH = os.path.join(STORE_DIR, "review_store.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    review_id   TEXT PRIMARY KEY,
+    source      TEXT NOT NULL,
+    app_id      TEXT NOT NULL,
+    bank        TEXT,
+    author      TEXT,
+    title       TEXT,
+    review_text TEXT,
+    rating      INTEGER,
+    first_seen  TEXT NOT NULL,
+    review_date TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_app ON reviews (source, app_id);
+"""
+
+def _connect(db_path=REVIEW_STORE_PATH):
+    conn = connect(db_path, _SCHEMA)
+    # Stores created before reviews carried their own date
+    if "review_date" not in {row[1] for row in conn.execute("PRAGMA table_info(reviews)")}:
+        conn.execute("ALTER TABLE reviews ADD COLUMN review_date TEXT")
+    return conn
+
+def review_key(source, app_id, author, review_text, native_id=None):
+    # Stable identity: the store's own review ID when it has one, else a hash of author + text
+    if native_id:
+        return f"{source}:{app_id}:{native_id}"
+    digest = hashlib.sha1(f"{author or ''}\x1f{review_text or ''}".encode("utf-8")).hexdigest()
+    return f"{source}:{app_id}:{digest}"
+
+def known_review_ids(review_ids, db_path=REVIEW_STORE_PATH):
+    review_ids = list(review_ids)
+    if not review_ids:
+        return set()
+    found = set()
+    conn = _connect(db_path)
+    try:
+        rows = select_in(conn, "SELECT review_id FROM reviews WHERE review_id IN ({values})", review_ids)
+        found.update(r[0] for r in rows)
+    finally:
+        conn.close()
+    return found
+
+def add_reviews(records, db_path=REVIEW_STORE_PATH):
+    # Inserts the records that are not stored yet and returns only those
+    records = list(records)
+    if not records:
+        return []
+    first_seen = datetime.now().isoformat(timespec="seconds")
+    new_records = []
+    conn = _connect(db_path)
+    try:
+        with conn:
+            for r in records:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO reviews "
+                    "(review_id, source, app_id, bank, author, title, review_text, rating, first_seen, review_date) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (r["review_id"], r["source"], r.get("app_id", ""), r.get("bank"), r.get("author"),
+                     r.get("title"), r.get("review_text"), r.get("rating"), first_seen, r.get("review_date"))
+                )
+                if cur.rowcount:
+                    new_records.append(r)
+    finally:
+        conn.close()
+    return new_records
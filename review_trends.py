@@ -0,0 +1,208 @@
+import os
+import numpy as np
+import pandas as pd
+from review_dataset import DATASET_DIR, iter_reviews
+from sqlite_db import connect, select_in
+
+REVIEW_TRENDS_PATH = os.path.join(DATASET_DIR, "review_trends.sqlite")
+
+GRANULARITIES = ["day", "week"]
+# Same cut as the comparison report's % negative
+NEGATIVE_SENTIMENT = -0.1
+
+# Summed per bucket, so any range of buckets (or banks / stores) combines by addition;
+# the unique_ columns count only canonical reviews (see dedup.py)
+SUM_COLUMNS = ["review_count", "rating_count", "rating_sum", "sentiment_sum", "negative_count"]
+UNIQUE_SUM_COLUMNS = [f"unique_{c}" for c in SUM_COLUMNS]
+
+# Columns returned by read_trends, in order
+TREND_COLUMNS = ["bucket_start", "bank", "source"] + SUM_COLUMNS + ["mean_rating", "mean_sentiment", "pct_negative"]
+
+# trend_reviews holds what each analyzed review contributed, so re-analyzing a review
+# replaces its contribution instead of counting it twice
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS trend_reviews (
+    review_id    TEXT PRIMARY KEY,
+    bank         TEXT NOT NULL,
+    source       TEXT NOT NULL,
+    review_day   TEXT NOT NULL,
+    rating       INTEGER,
+    sentiment    REAL NOT NULL,
+    is_canonical INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trend_buckets (
+    granularity  TEXT NOT NULL,
+    bank         TEXT NOT NULL,
+    source       TEXT NOT NULL,
+    bucket_start TEXT NOT NULL,
+    {", ".join(f"{c} REAL NOT NULL" for c in SUM_COLUMNS + UNIQUE_SUM_COLUMNS)},
+    PRIMARY KEY (granularity, bank, source, bucket_start)
+) WITHOUT ROWID;
+"""
+
+_CONTRIBUTION_COLUMNS = ["review_id", "bank", "source", "review_day", "rating", "sentiment", "is_canonical"]
+
+def _contributions(df):
+    # One row per dated review: its UTC day, rating, sentiment and whether it is canonical
+    if "review_date" not in df.columns:
+        return pd.DataFrame(columns=_CONTRIBUTION_COLUMNS)
+    day = df["review_date"].astype(object).where(df["review_date"].notna(), None).str[:10]
+    rows = pd.DataFrame({
+        "review_id": df["review_id"].astype(str).values,
+        "bank": df["bank"].astype(object).fillna("Unknown Bank").astype(str).values,
+        "source": df["source"].astype(object).fillna("").astype(str).values,
+        "review_day": day.values,
+        "rating": pd.to_numeric(df["rating"], errors="coerce").values,
+        "sentiment": pd.to_numeric(df["sentiment"], errors="coerce").fillna(0.0).astype(float).values,
+        "is_canonical": (df["canonical_id"].astype(object) == df["review_id"].astype(object)).values
+                        if "canonical_id" in df.columns else True,
+    })
+    rows = rows[rows["review_day"].notna()]
+    # A chunk never holds the same review twice, but a CSV export might
+    return rows.drop_duplicates("review_id", keep="last")
+
+def _stored_contributions(conn, review_ids):
+    rows = select_in(conn, f"SELECT {', '.join(_CONTRIBUTION_COLUMNS)} FROM trend_reviews WHERE review_id IN ({{values}})",
+                     review_ids)
+    return pd.DataFrame(rows, columns=_CONTRIBUTION_COLUMNS)
+
+def _bucket_sums(rows, sign=1):
+    # (granularity, bank, source, bucket_start) -> summed columns, times sign
+    if rows.empty:
+        return pd.DataFrame(columns=["granularity", "bank", "source", "bucket_start"] + SUM_COLUMNS + UNIQUE_SUM_COLUMNS)
+    rating = pd.to_numeric(rows["rating"], errors="coerce")
+    sentiment = rows["sentiment"].astype(float)
+    unique = rows["is_canonical"].astype(bool).values
+    values = pd.DataFrame({
+        "review_count": 1.0,
+        "rating_count": rating.notna().astype(float).values,
+        "rating_sum": rating.fillna(0.0).values,
+        "sentiment_sum": sentiment.values,
+        "negative_count": (sentiment < NEGATIVE_SENTIMENT).astype(float).values,
+    }, index=rows.index)
+    for c in SUM_COLUMNS:
+        values[f"unique_{c}"] = values[c] * unique
+    values *= sign
+
+    day = pd.to_datetime(rows["review_day"], format="%Y-%m-%d")
+    buckets = {
+        "day": rows["review_day"],
+        # Weeks start on Monday
+        "week": (day - pd.to_timedelta(day.dt.weekday, unit="D")).dt.strftime("%Y-%m-%d"),
+    }
+    sums = []
+    for granularity in GRANULARITIES:
+        keyed = values.assign(bank=rows["bank"], source=rows["source"], bucket_start=buckets[granularity])
+        grouped = keyed.groupby(["bank", "source", "bucket_start"], sort=False).sum().reset_index()
+        sums.append(grouped.assign(granularity=granularity))
+    return pd.concat(sums, ignore_index=True)
+
+def update_trends(df, db_path=REVIEW_TRENDS_PATH):
+    # Folds analyzed reviews into the daily and weekly buckets. Only the buckets
+    # these reviews fall in (or fell in, when re-analyzed) are written; the rest of
+    # the history is not read. Returns the number of buckets touched.
+    rows = _contributions(df)
+    if rows.empty:
+        return 0
+    conn = connect(db_path, _SCHEMA)
+    try:
+        with conn:
+            old = _stored_contributions(conn, rows["review_id"].tolist())
+            # New contributions in, previous ones of the same reviews out
+            delta = pd.concat([_bucket_sums(rows), _bucket_sums(old, sign=-1)], ignore_index=True)
+            keys = ["granularity", "bank", "source", "bucket_start"]
+            delta = delta.groupby(keys, sort=False).sum().reset_index()
+            columns = keys + SUM_COLUMNS + UNIQUE_SUM_COLUMNS
+            conn.executemany(
+                f"INSERT INTO trend_buckets ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT (granularity, bank, source, bucket_start) DO UPDATE SET "
+                + ", ".join(f"{c} = {c} + excluded.{c}" for c in SUM_COLUMNS + UNIQUE_SUM_COLUMNS),
+                delta[columns].itertuples(index=False, name=None),
+            )
+            # Buckets whose only reviews moved elsewhere
+            conn.executemany(
+                "DELETE FROM trend_buckets WHERE granularity = ? AND bank = ? AND source = ? AND bucket_start = ? "
+                "AND review_count < 0.5",
+                delta[keys].itertuples(index=False, name=None),
+            )
+            conn.executemany(
+                f"INSERT OR REPLACE INTO trend_reviews ({', '.join(_CONTRIBUTION_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_CONTRIBUTION_COLUMNS))})",
+                (
+                    (r.review_id, r.bank, r.source, r.review_day, None if pd.isna(r.rating) else int(r.rating),
+                     float(r.sentiment), int(bool(r.is_canonical)))
+                    for r in rows.itertuples(index=False)
+                ),
+            )
+    finally:
+        conn.close()
+    return len(delta)
+
+def read_trends(granularity="day", banks=None, sources=None, since=None, deduplicated=False, by_source=False,
+                db_path=REVIEW_TRENDS_PATH):
+    # One row per bucket and bank (and store with by_source), summed inside SQLite;
+    # deduplicated=True reads the canonical-review sums
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown trend granularity: {granularity}")
+    if not os.path.exists(db_path):
+        return pd.DataFrame(columns=TREND_COLUMNS)
+    prefix = "unique_" if deduplicated else ""
+    where, params = ["granularity = ?"], [granularity]
+    if banks is not None:
+        where.append(f"bank IN ({','.join('?' * len(banks))})")
+        params += list(banks)
+    if sources is not None:
+        where.append(f"source IN ({','.join('?' * len(sources))})")
+        params += list(sources)
+    if since is not None:
+        where.append("bucket_start >= ?")
+        params.append(since)
+    group = "bucket_start, bank, source" if by_source else "bucket_start, bank"
+    conn = connect(db_path, _SCHEMA)
+    try:
+        trends = pd.read_sql_query(
+            f"SELECT bucket_start, bank, {'source' if by_source else 'NULL AS source'}, "
+            + ", ".join(f"SUM({prefix}{c}) AS {c}" for c in SUM_COLUMNS)
+            + f" FROM trend_buckets WHERE {' AND '.join(where)} GROUP BY {group} HAVING SUM({prefix}review_count) > 0.5"
+            f" ORDER BY {group}", conn, params=params
+        )
+    finally:
+        conn.close()
+    return with_trend_means(trends)
+
+def with_trend_means(trends):
+    # Mean rating, mean sentiment and % negative from the summed columns
+    trends = trends.copy()
+    for c in ["review_count", "rating_count", "negative_count"]:
+        trends[c] = trends[c].round().astype(int)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        trends["mean_rating"] = trends["rating_sum"] / trends["rating_count"].where(trends["rating_count"] > 0)
+        trends["mean_sentiment"] = trends["sentiment_sum"] / trends["review_count"]
+        trends["pct_negative"] = trends["negative_count"] / trends["review_count"] * 100
+    return trends[TREND_COLUMNS]
+
+def rolling_trends(trends, window, granularity="day"):
+    # Trailing window of `window` buckets per bank (and store), missing buckets
+    # counting as empty; the sums roll, the means are recomputed from them
+    if window <= 1 or trends.empty:
+        return trends
+    freq = "W-MON" if granularity == "week" else "D"
+    rolled = []
+    for (bank, source), group in trends.groupby(["bank", "source"], dropna=False, sort=False):
+        sums = group.set_index(pd.to_datetime(group["bucket_start"]))[SUM_COLUMNS].astype(float)
+        sums = sums.reindex(pd.date_range(sums.index.min(), sums.index.max(), freq=freq), fill_value=0.0)
+        sums = sums.rolling(window, min_periods=1).sum()
+        sums = sums[sums["review_count"] > 0.5]
+        rolled.append(sums.assign(bucket_start=sums.index.strftime("%Y-%m-%d"), bank=bank, source=source))
+    return with_trend_means(pd.concat(rolled, ignore_index=True))
+
+def rebuild_trends(root=DATASET_DIR, db_path=None, batch_size=50_000):
+    # Backfill from the whole analysis dataset (rows without a review_date are skipped);
+    # safe to repeat, since every review replaces its earlier contribution
+    db_path = db_path or os.path.join(root, os.path.basename(REVIEW_TRENDS_PATH))
+    columns = ["review_id", "bank", "source", "rating", "sentiment", "canonical_id", "review_date"]
+    touched = 0
+    for df in iter_reviews("analysis", batch_size=batch_size, columns=columns, root=root):
+        touched += update_trends(df, db_path=db_path)
+    print(f"[AL agent] Trend aggregates rebuilt ({touched} bucket updates) in {db_path}")
+    return touched
@@ -0,0 +1,187 @@
+import os
+import sys
+import json
+import time
+import inspect
+import threading
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+METRICS_DIR = os.path.join("outputs", "metrics")
+# Latest run, for the node_exporter textfile collector
+PROMETHEUS_TEXTFILE = "oryx_pipeline.prom"
+
+# Per-stage totals for the current run:
+#   calls, seconds (summed over threads), max_seconds, requests, bytes, rows_in, rows_out,
+#   peak_rss_mb (process high-water mark when the stage last finished)
+_lock = threading.Lock()
+_stages = {}
+_run = {"run_id": None, "started_at": None, "start": None}
+
+def new_run_id():
+    # Shared by every stage of one pipeline run
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+def start_run(run_id):
+    with _lock:
+        _stages.clear()
+        _run.update(run_id=run_id, started_at=datetime.now().isoformat(timespec="seconds"), start=time.perf_counter())
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 2)
+
+def _entry(name):
+    return _stages.setdefault(name, {
+        "calls": 0, "seconds": 0.0, "max_seconds": 0.0, "requests": 0, "bytes": 0,
+        "rows_in": 0, "rows_out": 0, "peak_rss_mb": None,
+    })
+
+def _record(name, seconds, rows_in=0, rows_out=0):
+    rss = peak_rss_mb()
+    with _lock:
+        entry = _entry(name)
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+        entry["max_seconds"] = max(entry["max_seconds"], seconds)
+        entry["rows_in"] += int(rows_in or 0)
+        entry["rows_out"] += int(rows_out or 0)
+        entry["peak_rss_mb"] = rss
+
+def count_request(name, nbytes=0):
+    # One store request made on behalf of stage `name`
+    with _lock:
+        entry = _entry(name)
+        entry["requests"] += 1
+        entry["bytes"] += int(nbytes or 0)
+
+class _StageRun:
+    def __init__(self, rows_in):
+        self.rows_in = rows_in
+        self.rows_out = 0
+
+@contextmanager
+def stage(name, rows_in=0):
+    # with stage("aiml.features", rows_in=n) as s: ...; s.rows_out = m
+    run = _StageRun(rows_in)
+    start = time.perf_counter()
+    try:
+        yield run
+    finally:
+        _record(name, time.perf_counter() - start, run.rows_in, run.rows_out)
+
+def instrumented(name, rows_out=None):
+    # Times every call of the wrapped function as stage `name`; rows_out(result)
+    # gives the row count, if passed. Generators are timed only while producing
+    # items, and rows_out(item) is summed over the items (one row each by default).
+    def decorator(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                gen = fn(*args, **kwargs)
+                seconds, rows = 0.0, 0
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            item = next(gen)
+                        except StopIteration:
+                            break
+                        finally:
+                            seconds += time.perf_counter() - start
+                        rows += rows_out(item) if rows_out else 1
+                        yield item
+                finally:
+                    gen.close()
+                    _record(name, seconds, rows_out=rows)
+            return wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = None
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            finally:
+                _record(name, time.perf_counter() - start,
+                        rows_out=rows_out(result) if rows_out and result is not None else 0)
+        return wrapper
+    return decorator
+
+def snapshot():
+    with _lock:
+        return {
+            "run_id": _run["run_id"],
+            "started_at": _run["started_at"],
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "wall_seconds": round(time.perf_counter() - _run["start"], 4) if _run["start"] else None,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": {
+                name: dict(entry, seconds=round(entry["seconds"], 6), max_seconds=round(entry["max_seconds"], 6))
+                for name, entry in sorted(_stages.items())
+            },
+        }
+
+_PROMETHEUS_METRICS = [
+    ("calls", "oryx_stage_calls", "Calls of a pipeline stage in the run"),
+    ("seconds", "oryx_stage_seconds", "Wall time spent in a pipeline stage, summed over threads"),
+    ("max_seconds", "oryx_stage_max_seconds", "Longest single call of a pipeline stage"),
+    ("requests", "oryx_stage_requests", "Store requests made by a pipeline stage"),
+    ("bytes", "oryx_stage_bytes", "Bytes downloaded by a pipeline stage"),
+    ("rows_in", "oryx_stage_rows_in", "Rows a pipeline stage received"),
+    ("rows_out", "oryx_stage_rows_out", "Rows a pipeline stage produced"),
+    ("peak_rss_mb", "oryx_stage_peak_rss_megabytes", "Process peak RSS when the stage last finished"),
+]
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def prometheus_text(metrics):
+    run = _label(metrics["run_id"])
+    lines = []
+    for key, metric, help_text in _PROMETHEUS_METRICS:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        for name, entry in metrics["stages"].items():
+            if entry[key] is not None:
+                lines.append(f'{metric}{{run_id="{run}",stage="{_label(name)}"}} {entry[key]}')
+    for key, metric, help_text in [("wall_seconds", "oryx_run_wall_seconds", "Wall time of the run"),
+                                   ("peak_rss_mb", "oryx_run_peak_rss_megabytes", "Process peak RSS during the run")]:
+        if metrics[key] is not None:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge", f'{metric}{{run_id="{run}"}} {metrics[key]}']
+    return "\n".join(lines) + "\n"
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def write_run_metrics(run_id=None, metrics_dir=METRICS_DIR):
+    # <run_id>.json and <run_id>.prom, plus the latest run as oryx_pipeline.prom
+    metrics = snapshot()
+    run_id = run_id or metrics["run_id"] or "adhoc"
+    metrics["run_id"] = run_id
+    os.makedirs(metrics_dir, exist_ok=True)
+
+    json_path = os.path.join(metrics_dir, f"{run_id}.json")
+    _write_atomic(json_path, json.dumps(metrics, indent=2))
+    text = prometheus_text(metrics)
+    _write_atomic(os.path.join(metrics_dir, f"{run_id}.prom"), text)
+    _write_atomic(os.path.join(metrics_dir, PROMETHEUS_TEXTFILE), text)
+
+    slowest = sorted(metrics["stages"].items(), key=lambda kv: -kv[1]["seconds"])[:3]
+    summary = ", ".join(f"{name} {entry['seconds']:.2f}s" for name, entry in slowest)
+    print(f"[METRICS] 📈 Run {run_id}: {metrics['wall_seconds']}s wall, peak RSS {metrics['peak_rss_mb']} MB"
+          + (f" (slowest: {summary})" if summary else ""))
+    print(f"[METRICS] Written to {json_path}")
+    return json_path
@@ -0,0 +1,163 @@
+import os
+import re
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.feature_extraction.text import CountVectorizer
+
+# Bump when lexicons or scoring rules change so cached scores are invalidated
+SENTIMENT_ENGINE_VERSION = "lexicon-1"
+
+# Batches at least this large are scored across a process pool, in chunks of
+# CHUNK_SIZE; kept well below the analysis stage's chunk size (ANALYSIS_CHUNK_SIZE,
+# 50k), whose feature-cache misses are what reach this engine
+PARALLEL_MIN_ROWS = 20_000
+CHUNK_SIZE = 10_000
+
+# Words that flip the next sentiment word ("not good" = slightly bad, as in TextBlob)
+NEGATIONS = ("not", "no", "never", "لا", "ما", "مو", "مش", "غير", "ليس", "مب")
+NEGATION_FACTOR = -0.5
+
+# An exclamation mark right after a sentiment word boosts it
+EXCLAMATION_FACTOR = 1.25
+
+# Adverbs that scale the next sentiment word by their lexicon intensity ("very good")
+INTENSIFIERS = (
+    "very", "really", "so", "too", "extremely", "super", "absolutely", "totally", "pretty",
+    "quite", "most", "more", "much", "highly", "completely", "definitely", "especially",
+    "seriously", "truly", "incredibly", "terribly", "awfully", "horribly", "real", "جدا", "كثير",
+)
+
+# Normalized Arabic forms (see normalize_text); polarity on TextBlob's -1..1 scale
+ARABIC_LEXICON = {
+    "ممتاز": 1.0, "ممتازه": 1.0, "رائع": 0.9, "رائعه": 0.9, "روعه": 0.9, "عظيم": 0.8,
+    "متميز": 0.8, "مبدع": 0.8, "افضل": 0.8, "احسن": 0.7, "جميل": 0.7, "جميله": 0.7,
+    "جيد": 0.6, "جيده": 0.6, "زين": 0.6, "حلو": 0.6, "ممتع": 0.6, "ناجح": 0.6, "احب": 0.6,
+    "سهل": 0.5, "سهله": 0.5, "سريع": 0.5, "سريعه": 0.5, "مفيد": 0.5, "مريح": 0.5,
+    "تمام": 0.5, "موفق": 0.5, "شكرا": 0.5, "يشتغل": 0.4, "يعمل": 0.3, "واضح": 0.3,
+    "سيء": -0.7, "سيي": -0.7, "سيءه": -0.7, "سييه": -0.7, "سء": -0.7, "زفت": -0.9,
+    "فاشل": -0.9, "فاشله": -0.9, "اسوا": -1.0, "اسوء": -1.0, "كارثه": -0.9, "خربان": -0.7,
+    "خراب": -0.7, "مزعج": -0.6, "معطل": -0.6, "بطيء": -0.5, "بطيي": -0.5, "بطء": -0.5,
+    "بطي": -0.5, "ضعيف": -0.5, "تعطل": -0.5, "عطل": -0.5, "يعلق": -0.5, "معلق": -0.4,
+    "مشكله": -0.4, "مشاكل": -0.4, "خطا": -0.4, "اسف": -0.4, "صعب": -0.4, "تعبان": -0.5,
+}
+
+_ARABIC_DIACRITICS = re.compile("[ً-ْـ]")
+_ARABIC_PREFIX = re.compile(r"\b(?:وال|بال|فال|كال|لل|ال)(?=\w{3})")
+_ARABIC_LETTERS = str.maketrans({"إ": "ا", "أ": "ا", "آ": "ا", "ٱ": "ا", "ة": "ه", "ى": "ي", "ؤ": "و", "ئ": "ي"})
+_NOT_CONTRACTION = re.compile(r"n['’]t\b")
+
+def normalize_text(text):
+    # Lowercase, expand "n't", fold Arabic letter variants and strip the definite article
+    text = _NOT_CONTRACTION.sub(" not", str(text).lower())
+    if text.isascii():
+        return text
+    text = _ARABIC_DIACRITICS.sub("", text).translate(_ARABIC_LETTERS)
+    return _ARABIC_PREFIX.sub("", text)
+
+def english_lexicon():
+    # TextBlob's pattern lexicon, averaged over word senses: word -> (polarity, intensity)
+    from textblob.en import sentiment as pattern_lexicon
+    return {w: (v[None][0], v[None][2]) for w, v in pattern_lexicon.items()}
+
+def load_lexicon(path):
+    # Tab-separated "word<TAB>polarity[<TAB>intensity]" lines
+    lexicon = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 2 or line.startswith("#"):
+                continue
+            intensity = float(parts[2]) if len(parts) > 2 else 1.0
+            lexicon[normalize_text(parts[0]).strip()] = (float(parts[1]), intensity)
+    return lexicon
+
+class LexiconScorer:
+    # Polarity is the mean over sentiment words, like TextBlob, computed for a whole
+    # batch as (X @ weights) / (X @ counts) on a sparse unigram + bigram matrix.
+    # Bigram rows correct their unigrams for negation, intensifiers and "!".
+
+    def __init__(self, lexicons=None):
+        if lexicons is None:
+            lexicons = [english_lexicon(), {normalize_text(w): (p, 1.0) for w, p in ARABIC_LEXICON.items()}]
+        lexicon = {}
+        for lex in lexicons:
+            lexicon.update(lex)
+
+        features, weights, counts = [], [], []
+
+        def _add(feature, weight, count):
+            features.append(feature)
+            weights.append(weight)
+            counts.append(count)
+
+        for word, (polarity, _) in lexicon.items():
+            if " " not in word:
+                _add(word, polarity, 1.0)
+        for word, (polarity, _) in lexicon.items():
+            if " " in word:
+                continue
+            for neg in NEGATIONS:
+                if neg not in lexicon:
+                    # "not good": replaces the plain "good" contribution with -0.5 * good
+                    _add(f"{neg} {word}", (NEGATION_FACTOR - 1.0) * polarity, 0.0)
+            for mod in INTENSIFIERS:
+                if mod in lexicon and mod != word:
+                    # "very good": one assessment of good * intensity(very) instead of two
+                    merged = max(-1.0, min(polarity * lexicon[mod][1], 1.0))
+                    _add(f"{mod} {word}", merged - polarity - lexicon[mod][0], -1.0)
+            boosted = max(-1.0, min(polarity * EXCLAMATION_FACTOR, 1.0))
+            _add(f"{word} !", boosted - polarity, 0.0)
+
+        self.vectorizer = CountVectorizer(
+            preprocessor=normalize_text,
+            token_pattern=r"(?u)\b\w+\b|!",
+            ngram_range=(1, 2),
+            vocabulary={f: i for i, f in enumerate(features)},
+            dtype=np.float32,
+        )
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.counts = np.asarray(counts, dtype=np.float32)
+
+    def score(self, texts):
+        X = self.vectorizer.transform(["" if t is None else str(t) for t in texts])
+        total = X @ self.weights
+        n = X @ self.counts
+        polarity = np.divide(total, n, out=np.zeros_like(total), where=n > 0)
+        return np.clip(polarity, -1.0, 1.0)
+
+_scorer = None
+
+def _get_scorer():
+    # Built once per process; pool workers build their own on first use
+    global _scorer
+    if _scorer is None:
+        _scorer = LexiconScorer()
+    return _scorer
+
+def _lexicon_chunk(texts):
+    return _get_scorer().score(texts)
+
+def lexicon_polarity(texts, n_jobs=None):
+    texts = list(texts)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if len(texts) < PARALLEL_MIN_ROWS or n_jobs == 1:
+        return _lexicon_chunk(texts)
+
+    chunks = [texts[i:i + CHUNK_SIZE] for i in range(0, len(texts), CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        return np.concatenate(list(pool.map(_lexicon_chunk, chunks)))
+
+def textblob_polarity(texts, n_jobs=None):
+    # Reference engine: one TextBlob per review (slow, English only)
+    from textblob import TextBlob
+    return np.array([TextBlob(str(t)).sentiment.polarity for t in texts])
+
+SENTIMENT_ENGINES = {
+    "lexicon": lexicon_polarity,
+    "textblob": textblob_polarity,
+}
+
+def score_sentiment(texts, engine="lexicon", n_jobs=None):
+    if engine not in SENTIMENT_ENGINES:
+        raise ValueError(f"Unknown sentiment engine: {engine} (choose from {', '.join(SENTIMENT_ENGINES)})")
+    return SENTIMENT_ENGINES[engine](texts, n_jobs=n_jobs)
@@ -0,0 +1,27 @@
+import os
+import sqlite3
+
+# Shared by every SQLite file the pipeline keeps: review store and crawl checkpoints,
+# feature cache, dedup and search indexes, trend aggregates
+BUSY_TIMEOUT = 30
+# Values per IN (...) list, to stay under SQLite's bound-parameter limit
+MAX_IN_VALUES = 500
+
+def connect(db_path, schema=None):
+    # WAL, so readers (the dashboard) and the pipeline's writers do not block each other
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    if schema:
+        conn.executescript(schema)
+    return conn
+
+def select_in(conn, query, values):
+    # All rows of query over values, where query's "{values}" stands for the IN list;
+    # run MAX_IN_VALUES values at a time
+    values = list(values)
+    rows = []
+    for i in range(0, len(values), MAX_IN_VALUES):
+        chunk = values[i:i + MAX_IN_VALUES]
+        rows.extend(conn.execute(query.format(values=",".join("?" * len(chunk))), chunk).fetchall())
+    return rows
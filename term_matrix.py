@@ -0,0 +1,175 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+from review_dataset import DATASET_DIR, read_reviews
+from sentiment_engine import normalize_text
+
+# Term counts of every analyzed review, saved next to the "analysis" dataset so
+# consumers (dashboard bigrams, report keywords) never re-tokenize the text:
+#   analysis_terms/vocab.txt          one term per line, append-only; line number = column
+#   analysis_terms/<run>-<part>/      data.npy, indices.npy, indptr.npy (CSR) and review_ids.npy
+# All .npy files are memory-mapped on load.
+TERMS_DIRNAME = "analysis_terms"
+VOCAB_FILE = "vocab.txt"
+
+_vocab_cache = {}
+
+def terms_path(root=DATASET_DIR):
+    return os.path.join(root, TERMS_DIRNAME)
+
+def term_vectorizer():
+    # Unigrams and bigrams of the normalized text (Arabic letter variants folded)
+    return CountVectorizer(preprocessor=normalize_text, ngram_range=(1, 2), stop_words="english", dtype=np.int32)
+
+def load_vocab(root=DATASET_DIR):
+    # {term: column}, re-read only when vocab.txt has grown
+    path = os.path.join(terms_path(root), VOCAB_FILE)
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    cached = _vocab_cache.get(path)
+    if cached is None or cached[0] != size:
+        terms = []
+        if size:
+            with open(path, encoding="utf-8") as f:
+                terms = f.read().split("\n")[:-1]
+        cached = (size, {t: i for i, t in enumerate(terms)}, terms)
+        _vocab_cache[path] = cached
+    return cached[1], cached[2]
+
+def save_term_matrix(texts, review_ids, name, root=DATASET_DIR):
+    # Counts the terms of one analysis chunk and stores them under the shared vocabulary
+    directory = terms_path(root)
+    os.makedirs(directory, exist_ok=True)
+    vectorizer = term_vectorizer()
+    try:
+        X = vectorizer.fit_transform(texts).tocsr()
+        local_terms = vectorizer.get_feature_names_out()
+    except ValueError:
+        # Nothing but stop words
+        X = sp.csr_matrix((len(texts), 0), dtype=np.int32)
+        local_terms = np.array([], dtype=object)
+
+    vocab, _ = load_vocab(root)
+    new_terms = [t for t in local_terms if t not in vocab]
+    if new_terms:
+        with open(os.path.join(directory, VOCAB_FILE), "a", encoding="utf-8") as f:
+            f.write("".join(f"{t}\n" for t in new_terms))
+        vocab, _ = load_vocab(root)
+    columns = np.array([vocab[t] for t in local_terms], dtype=np.int32)
+
+    part_dir = os.path.join(directory, name)
+    tmp_dir = f"{part_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, "data.npy"), X.data.astype(np.int32))
+    np.save(os.path.join(tmp_dir, "indices.npy"), columns[X.indices] if len(columns) else X.indices.astype(np.int32))
+    np.save(os.path.join(tmp_dir, "indptr.npy"), X.indptr.astype(np.int64))
+    np.save(os.path.join(tmp_dir, "review_ids.npy"), np.asarray([str(r) for r in review_ids]))
+    shutil.rmtree(part_dir, ignore_errors=True)
+    os.replace(tmp_dir, part_dir)
+    return X.shape[0]
+
+def _part_dirs(root=DATASET_DIR):
+    directory = terms_path(root)
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        part_dir = os.path.join(directory, name)
+        if not name.endswith(".tmp") and os.path.isdir(part_dir):
+            yield part_dir
+
+def iter_term_matrices(root=DATASET_DIR):
+    # (review_ids, CSR counts over the current vocabulary) per saved chunk, memory-mapped
+    _, terms = load_vocab(root)
+    for part_dir in _part_dirs(root):
+        load = lambda f: np.load(os.path.join(part_dir, f), mmap_mode="r")
+        indptr = load("indptr.npy")
+        X = sp.csr_matrix((load("data.npy"), load("indices.npy"), indptr),
+                          shape=(len(indptr) - 1, len(terms)), copy=False)
+        yield load("review_ids.npy"), X
+
+def saved_term_mask(review_ids, root=DATASET_DIR):
+    # True for the rows whose review has saved term counts
+    review_ids = np.asarray(review_ids).astype(str)
+    saved = [np.load(os.path.join(d, "review_ids.npy"), mmap_mode="r") for d in _part_dirs(root)]
+    if not saved:
+        return np.zeros(len(review_ids), dtype=bool)
+    return np.isin(review_ids, np.concatenate(saved))
+
+def texts_without_terms(df, stage="analysis", root=DATASET_DIR, **filters):
+    # review_text for the rows of df (read from the dataset with the same filters)
+    # that have no saved term counts; None for the rest, so covered text is never loaded
+    ids = df["review_id"].astype(object)
+    missing = ~saved_term_mask(ids.fillna("").values, root)
+    texts = pd.Series([None] * len(df), index=df.index, dtype=object)
+    if not missing.any():
+        return texts
+    if missing.all() or ids[missing].isna().any():
+        # Nothing saved (or rows without an ID): same scan, so the rows line up
+        read = read_reviews(stage, columns=["review_text"], root=root, **filters)
+        texts[missing] = read["review_text"].astype(object).values[missing]
+    else:
+        read = read_reviews(stage, columns=["review_id", "review_text"], review_ids=ids[missing].unique().tolist(),
+                            root=root)
+        by_id = read.drop_duplicates("review_id").set_index("review_id")["review_text"].astype(object)
+        texts[missing] = ids[missing].map(by_id).values
+    return texts
+
+def grouped_term_counts(review_ids, group_codes, n_groups, root=DATASET_DIR, weights=None, texts=None):
+    # (groups x terms) sums of the term counts for the given rows, where group_codes[i]
+    # is the group of review_ids[i]; saved counts are read chunk by chunk, so only the
+    # memory-mapped pages touched are read. Rows without saved counts are tokenized
+    # from texts (aligned with review_ids); None if that is needed but texts is None.
+    review_ids = np.asarray(review_ids).astype(str)
+    group_codes = np.asarray(group_codes)
+    weights = np.ones(len(review_ids)) if weights is None else np.asarray(weights, dtype=float)
+    # A review listed twice counts twice: groups x distinct reviews
+    unique_ids, inverse = np.unique(review_ids, return_inverse=True)
+    G = sp.csr_matrix((weights, (group_codes, inverse)), shape=(n_groups, len(unique_ids)))
+
+    _, terms = load_vocab(root)
+    total = sp.csr_matrix((n_groups, len(terms)))
+    covered = np.zeros(len(unique_ids), dtype=bool)
+    for ids, X in iter_term_matrices(root):
+        # Rows of this chunk that are among review_ids and not counted yet
+        slot = np.searchsorted(unique_ids, ids)
+        slot[slot == len(unique_ids)] = 0
+        found = unique_ids[slot] == ids if len(unique_ids) else np.zeros(len(ids), dtype=bool)
+        rows = np.flatnonzero(found)
+        slots, first = np.unique(slot[rows], return_index=True)
+        rows = rows[first]
+        fresh = ~covered[slots]
+        rows, slots = rows[fresh], slots[fresh]
+        if not len(rows):
+            continue
+        covered[slots] = True
+        S = sp.csr_matrix((np.ones(len(rows)), (slots, rows)), shape=(len(unique_ids), X.shape[0]))
+        total = total + (G @ S) @ X
+    terms = np.asarray(terms, dtype=object)
+
+    missing = np.flatnonzero(~covered[inverse])
+    if len(missing):
+        if texts is None:
+            return None
+        vectorizer = term_vectorizer()
+        try:
+            X = vectorizer.fit_transform(pd.Series(np.asarray(texts, dtype=object)[missing]).fillna("").astype(str))
+        except ValueError:
+            # Nothing but stop words
+            return total.tocsr(), terms
+        local_terms = vectorizer.get_feature_names_out()
+        # Terms the shared vocabulary lacks get columns after it
+        index = {t: i for i, t in enumerate(terms)}
+        new_terms = [t for t in local_terms if t not in index]
+        index.update({t: len(terms) + i for i, t in enumerate(new_terms)})
+        columns = np.array([index[t] for t in local_terms], dtype=np.int64)
+        n_terms = len(terms) + len(new_terms)
+        X = sp.csr_matrix((X.data, columns[X.indices], X.indptr), shape=(X.shape[0], n_terms))
+        Gm = sp.csr_matrix((weights[missing], (group_codes[missing], np.arange(len(missing)))),
+                           shape=(n_groups, len(missing)))
+        total = total.tocsr()
+        total = sp.csr_matrix((total.data, total.indices, total.indptr), shape=(n_groups, n_terms)) + Gm @ X
+        terms = np.concatenate([terms, np.asarray(new_terms, dtype=object)])
+    return total.tocsr(), terms
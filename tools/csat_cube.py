@@ -0,0 +1,121 @@
+# csat_cube.py
+# Pre-aggregated view of an analysis dataset for the CSAT dashboard: every KPI and
+# chart is a sum over cube cells, every bigram table a sum of sparse count rows.
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+from term_matrix import grouped_term_counts
+
+CUBE_DIMENSIONS = ["bank", "source", "rating", "cluster", "polarity"]
+BIGRAM_DIMENSIONS = ["bank", "source", "rating"]
+
+# Cap on the bigram vocabulary kept in the cube (most frequent first)
+BIGRAM_VOCAB_SIZE = 50_000
+
+def build_cube(df: pd.DataFrame, bank_col, src_col, rating_col, cluster_col, sent_col, text_col,
+               bigram_vocab_size=BIGRAM_VOCAB_SIZE, canonical_col=None, review_id_col=None, terms_root=None):
+    # The first row of every canonical_id counts once in the deduplicated totals;
+    # rows without one (older datasets) are all unique
+    if canonical_col is not None:
+        canonical = df[canonical_col]
+        unique = (canonical.isna() | ~canonical.duplicated()).values
+    else:
+        unique = np.ones(len(df), dtype=bool)
+    keys = pd.DataFrame({
+        "bank": df[bank_col].values,
+        "source": df[src_col].values,
+        "rating": pd.to_numeric(df[rating_col], errors="coerce").values,
+        "cluster": pd.to_numeric(df[cluster_col], errors="coerce").fillna(-1).astype(int).values,
+        "polarity": df["polarity"].astype(str).values,
+        "sentiment": pd.to_numeric(df[sent_col], errors="coerce").fillna(0.0).values,
+        "unique": unique.astype(int),
+    })
+    keys["unique_sentiment"] = keys["sentiment"] * keys["unique"]
+
+    # Raw and deduplicated counts and sentiment sums per bank x source x rating x cluster x polarity
+    cells = (
+        keys.groupby(CUBE_DIMENSIONS, dropna=False, observed=True)
+        .agg(count=("sentiment", "size"), sentiment_sum=("sentiment", "sum"),
+             unique_count=("unique", "sum"), unique_sentiment_sum=("unique_sentiment", "sum"))
+        .reset_index()
+    )
+
+    # One bigram count vector per bank x source x rating: (groups x rows) @ (rows x bigrams)
+    group_codes = keys.groupby(BIGRAM_DIMENSIONS, dropna=False, observed=True).ngroup().values
+    first_rows = pd.Series(np.arange(len(keys))).groupby(group_codes).first().values
+    bigram_groups = keys[BIGRAM_DIMENSIONS].iloc[first_rows].reset_index(drop=True)
+
+    # Bigram counts come from the term matrices the analysis stage saved (memory-mapped);
+    # rows without them are tokenized from text_col (which only needs text for those rows).
+    # CSV exports tokenize everything here. Raw and canonical-only counts come from one
+    # pass: the rows are listed twice, the second time in groups offset by n_groups.
+    saved = None
+    if review_id_col is not None and terms_root is not None:
+        n_groups = len(bigram_groups)
+        ids = df[review_id_col].values
+        texts = np.tile(df[text_col].astype(object).values, 2) if text_col in df.columns else None
+        counts = grouped_term_counts(np.tile(ids, 2), np.concatenate([group_codes, group_codes + n_groups]),
+                                     2 * n_groups, root=terms_root,
+                                     weights=np.concatenate([np.ones(len(df)), unique]), texts=texts)
+        if counts is not None:
+            counts, terms = counts
+            saved = counts[:n_groups], counts[n_groups:], terms
+    if saved is not None:
+        counts, unique_counts, terms = saved
+        bigrams = np.flatnonzero(np.char.find(terms.astype(str), " ") >= 0) if len(terms) else np.array([], dtype=int)
+        totals = np.asarray(counts[:, bigrams].sum(axis=0)).ravel()
+        keep = bigrams[np.argsort(-totals, kind="stable")[:bigram_vocab_size]]
+        keep = np.sort(keep[np.asarray(counts[:, keep].sum(axis=0)).ravel() > 0])
+        bigram_counts, unique_bigram_counts, vocab = counts[:, keep], unique_counts[:, keep], terms[keep]
+    else:
+        vectorizer = CountVectorizer(ngram_range=(2, 2), stop_words="english", max_features=bigram_vocab_size)
+        try:
+            X = vectorizer.fit_transform(df[text_col].fillna("").astype(str))
+            vocab = vectorizer.get_feature_names_out()
+        except ValueError:
+            # No bigrams at all (empty or stop-word-only text)
+            X = sp.csr_matrix((len(df), 0))
+            vocab = np.array([], dtype=object)
+        G = sp.csr_matrix(
+            (np.ones(len(df)), (group_codes, np.arange(len(df)))),
+            shape=(len(bigram_groups), len(df)),
+        )
+        G_unique = sp.csr_matrix(
+            (np.ones(unique.sum()), (group_codes[unique], np.flatnonzero(unique))),
+            shape=(len(bigram_groups), len(df)),
+        )
+        bigram_counts, unique_bigram_counts = G @ X, G_unique @ X
+
+    return {
+        "cells": cells,
+        "bigram_groups": bigram_groups,
+        "bigram_counts": bigram_counts.tocsr(),
+        "unique_bigram_counts": unique_bigram_counts.tocsr(),
+        "bigram_vocab": vocab,
+    }
+
+def _mask(frame: pd.DataFrame, banks, sources, rating_range):
+    return (
+        frame["bank"].isin(banks) &
+        frame["source"].isin(sources) &
+        frame["rating"].between(rating_range[0], rating_range[1])
+    ).values
+
+def select_cells(cube, banks, sources, rating_range, deduplicated=False) -> pd.DataFrame:
+    # deduplicated=True puts the canonical-review totals in count / sentiment_sum
+    cells = cube["cells"]
+    cells = cells[_mask(cells, banks, sources, rating_range)]
+    if deduplicated:
+        cells = cells.assign(count=cells["unique_count"], sentiment_sum=cells["unique_sentiment_sum"])
+    return cells
+
+def top_bigrams(cube, banks, sources, rating_range, n=20, deduplicated=False) -> pd.DataFrame:
+    rows = np.flatnonzero(_mask(cube["bigram_groups"], banks, sources, rating_range))
+    if len(rows) == 0 or len(cube["bigram_vocab"]) == 0:
+        return pd.DataFrame(columns=["Bigram", "Count"])
+    counts = cube["unique_bigram_counts" if deduplicated else "bigram_counts"]
+    totals = np.asarray(counts[rows].sum(axis=0)).ravel()
+    top = np.argsort(-totals, kind="stable")[:n]
+    top = top[totals[top] > 0]
+    return pd.DataFrame({"Bigram": cube["bigram_vocab"][top], "Count": totals[top].astype(int)})
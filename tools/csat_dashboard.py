@@ -7,7 +7,29 @@ import altair as alt
 from PIL import Image
 import base64
 from io import BytesIO
-from sklearn.feature_extraction.text import CountVectorizer
+
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from review_dataset import read_reviews, dataset_version
+from term_matrix import texts_without_terms
+from review_index import search_reviews
+from csat_cube import build_cube, select_cells, top_bigrams
+from review_trends import read_trends, rolling_trends
+
+# Columns the aggregate cube is built from; review text is read only for rows
+# without saved term counts, and for the search fallback
+CUBE_COLUMNS = ["review_id", "bank", "source", "rating", "sentiment", "cluster", "canonical_id"]
+DASHBOARD_COLUMNS = CUBE_COLUMNS + ["top_keyword", "review_text"]
+REVIEW_PAGE_SIZE = 50
+
+# Trend view metrics: label -> (read_trends column, tooltip format)
+TREND_METRICS = {
+    "Reviews": ("review_count", ","),
+    "Mean Rating": ("mean_rating", ".2f"),
+    "Mean Sentiment": ("mean_sentiment", ".3f"),
+    "% Negative": ("pct_negative", ".1f"),
+}
 
 # ---------- Helpers ----------
 def _first_present(d: pd.DataFrame, candidates):
@@ -62,6 +84,80 @@ def _prep(df: pd.DataFrame):
 
     return df, bank_col, text_col, sent_col, cluster_col, keyword_col, rating_col, src_col
 
+def _dataset_location(data_path: str):
+    # An analysis dataset directory such as outputs/dataset/analysis -> (stage, root)
+    data_path = os.path.normpath(data_path)
+    return os.path.basename(data_path), os.path.dirname(data_path)
+
+def _data_version(data_path: str):
+    # Cache key that changes whenever the underlying files change
+    if os.path.isdir(data_path):
+        stage, root = _dataset_location(data_path)
+        return dataset_version(stage, root=root)
+    stat = os.stat(data_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+@st.cache_resource(show_spinner="Loading reviews...", max_entries=1)
+def _load_csv(data_path: str, version: str):
+    # CSV exports have no term matrices or search index, so the whole file stays loaded
+    return _prep(pd.read_csv(data_path))
+
+@st.cache_data(show_spinner="Building aggregates...", max_entries=4)
+def _load_cube(data_path: str, version: str):
+    # Only the cube is cached; the frame it is built from is dropped afterwards
+    if os.path.isdir(data_path):
+        stage, root = _dataset_location(data_path)
+        raw_df = read_reviews(stage, columns=CUBE_COLUMNS, root=root)
+        # Datasets carry memory-mapped term matrices from the analysis stage
+        raw_df["review_text"] = texts_without_terms(raw_df, stage, root=root)
+        df, bank_col, text_col, sent_col, cluster_col, _, rating_col, src_col = _prep(raw_df)
+        return build_cube(df, bank_col, src_col, rating_col, cluster_col, sent_col, text_col,
+                          canonical_col="canonical_id", review_id_col="review_id", terms_root=root)
+    df, bank_col, text_col, sent_col, cluster_col, _, rating_col, src_col = _load_csv(data_path, version)
+    canonical_col = "canonical_id" if "canonical_id" in df.columns else None
+    return build_cube(df, bank_col, src_col, rating_col, cluster_col, sent_col, text_col, canonical_col=canonical_col)
+
+def _index_path(data_path: str):
+    # The full-text index sits next to the dataset stages (see review_index.py)
+    if not os.path.isdir(data_path):
+        return None
+    _, root = _dataset_location(data_path)
+    path = os.path.join(root, "review_index.sqlite")
+    return path if os.path.exists(path) else None
+
+def _trends_path(data_path: str):
+    # The rolling trend aggregates sit next to the dataset stages (see review_trends.py)
+    if not os.path.isdir(data_path):
+        return None
+    _, root = _dataset_location(data_path)
+    path = os.path.join(root, "review_trends.sqlite")
+    return path if os.path.exists(path) else None
+
+def _search_frame(data_path: str, version: str, query: str, banks, sources, rating_range, page: int,
+                  deduplicated: bool = False):
+    # Fallback for CSV exports and unindexed datasets: substring match, reading only
+    # the filtered rows of a dataset
+    if os.path.isdir(data_path):
+        stage, root = _dataset_location(data_path)
+        df, bank_col, text_col, _, _, _, rating_col, src_col = _prep(read_reviews(
+            stage, columns=DASHBOARD_COLUMNS, banks=banks, sources=sources,
+            min_rating=rating_range[0], max_rating=rating_range[1], root=root
+        ))
+    else:
+        df, bank_col, text_col, _, _, _, rating_col, src_col = _load_csv(data_path, version)
+    mask = (
+        df[bank_col].isin(banks) &
+        df[src_col].isin(sources) &
+        df[rating_col].between(rating_range[0], rating_range[1])
+    )
+    if deduplicated and "canonical_id" in df.columns and "review_id" in df.columns:
+        mask &= df["canonical_id"].isna() | (df["canonical_id"] == df["review_id"])
+    for term in query.split():
+        mask &= df[text_col].astype(str).str.contains(term, case=False, regex=False)
+    matches = df[mask]
+    start = (page - 1) * REVIEW_PAGE_SIZE
+    return len(matches), matches.iloc[start:start + REVIEW_PAGE_SIZE].copy()
+
 def _kpi(label: str, value, help_text: str = ""):
     st.markdown(
         f"""
@@ -75,7 +171,7 @@ def _kpi(label: str, value, help_text: str = ""):
     )
 
 # ---------- Main Dashboard ----------
-def generate_dashboard(csv_path: str):
+def generate_dashboard(data_path: str):
     st.set_page_config(page_title="Oryx Bank App Sentiment Dashboard", layout="wide")
 
     if os.path.exists("logo.png"):
@@ -96,23 +192,27 @@ def generate_dashboard(csv_path: str):
     else:
         st.title("Oryx Mobile Banking App Customer Satisfaction")
 
-    if not os.path.exists(csv_path):
-        st.error(f"CSV not found: {csv_path}")
+    if not os.path.exists(data_path):
+        st.error(f"Dataset not found: {data_path}")
         return
 
-    raw_df = pd.read_csv(csv_path)
-    if raw_df.empty:
+    # The aggregate cube is built once per dataset version and cached by Streamlit;
+    # filter changes only sum cube cells
+    version = _data_version(data_path)
+    cube = _load_cube(data_path, version)
+    cells = cube["cells"]
+    if cells.empty:
         st.warning("The dataset is empty. Try scraping more reviews.")
         return
 
-    df, bank_col, text_col, sent_col, cluster_col, keyword_col, rating_col, src_col = _prep(raw_df)
+    all_banks = sorted(cells["bank"].dropna().unique())
+    all_sources = sorted(cells["source"].dropna().unique())
+    has_ratings = cells["rating"].notna().any()
 
     # --- Filters: No default selection ---
     st.markdown("### 🔧 Filter Options")
-    col1, col2, col3 = st.columns([3, 3, 2])
+    col1, col2, col3, col4 = st.columns([3, 3, 2, 2])
 
-    all_banks = sorted(df[bank_col].dropna().unique())
-    all_sources = sorted(df[src_col].dropna().unique())
     rating_min, rating_max = 1, 5
 
     with col1:
@@ -120,10 +220,15 @@ def generate_dashboard(csv_path: str):
     with col2:
         selected_sources = st.multiselect("Sources", options=all_sources, default=[])
     with col3:
-        if df[rating_col].notna().any():
+        if has_ratings:
             rating_range = st.slider("Rating range", min_value=1, max_value=5, value=(rating_min, rating_max))
         else:
             rating_range = (1, 5)
+    with col4:
+        # Near-duplicate reviews share a canonical_id; deduplicated counts take each once
+        counting = st.radio("Counts", ["Deduplicated", "Raw"], horizontal=True,
+                            help="Deduplicated counts near-identical reviews once")
+    deduplicated = counting == "Deduplicated"
 
     # --- Load Data Button Logic ---
     if "load_triggered" not in st.session_state:
@@ -136,17 +241,13 @@ def generate_dashboard(csv_path: str):
         st.warning("Please select at least one Bank and one Source to load data.")
         return
 
-    fdf = df[
-        df[bank_col].isin(selected_banks) &
-        df[src_col].isin(selected_sources) &
-        df[rating_col].between(rating_range[0], rating_range[1])
-    ]
-
     if not st.session_state["load_triggered"]:
         st.info("Please click the 'Load Data' button to generate the dashboard.")
         return
 
-    if fdf.empty:
+    fcells = select_cells(cube, selected_banks, selected_sources, rating_range, deduplicated=deduplicated)
+    total = int(fcells["count"].sum())
+    if total == 0:
         st.info("No data matches your filters. Try adjusting the selections.")
         return
 
@@ -163,15 +264,20 @@ def generate_dashboard(csv_path: str):
             unsafe_allow_html=True
         )
 
+    by_polarity = fcells.groupby("polarity")["count"].sum()
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        _kpi("Total Reviews", f"{len(fdf):,}", help_text="Based on selected filters")
+        if deduplicated:
+            raw_total = int(select_cells(cube, selected_banks, selected_sources, rating_range)["count"].sum())
+            _kpi("Unique Reviews", f"{total:,}", help_text=f"{raw_total - total:,} near-duplicates of {raw_total:,} hidden")
+        else:
+            _kpi("Total Reviews", f"{total:,}", help_text="Based on selected filters")
     with col2:
-        _kpi("Average Sentiment", f"{fdf[sent_col].mean():.3f}")
+        _kpi("Average Sentiment", f"{fcells['sentiment_sum'].sum() / total:.3f}")
     with col3:
-        _kpi("% Positive", f"{(fdf['polarity'] == 'Positive').mean() * 100:.1f}%")
+        _kpi("% Positive", f"{by_polarity.get('Positive', 0) / total * 100:.1f}%")
     with col4:
-        _kpi("% Negative", f"{(fdf['polarity'] == 'Negative').mean() * 100:.1f}%")
+        _kpi("% Negative", f"{by_polarity.get('Negative', 0) / total * 100:.1f}%")
 
 
     # --- Charts ---
@@ -179,12 +285,13 @@ def generate_dashboard(csv_path: str):
 
     with left:
         st.subheader("Average Sentiment by Bank")
-        avg_by_bank = fdf.groupby(bank_col)[sent_col].mean().reset_index(name="avg_sentiment")
+        sums = fcells.groupby("bank")[["sentiment_sum", "count"]].sum()
+        avg_by_bank = (sums["sentiment_sum"] / sums["count"]).reset_index(name="avg_sentiment")
         
         chart = alt.Chart(avg_by_bank).mark_bar().encode(
             x=alt.X("avg_sentiment:Q", title="Avg Sentiment"),
-            y=alt.Y(f"{bank_col}:N", title="Bank", sort='-x'),
-            tooltip=[bank_col, alt.Tooltip("avg_sentiment", title="Avg Sentiment", format=".3f")]
+            y=alt.Y("bank:N", title="Bank", sort='-x'),
+            tooltip=["bank", alt.Tooltip("avg_sentiment", title="Avg Sentiment", format=".3f")]
         ).properties(height=320)
         
         st.altair_chart(chart, use_container_width=True)
@@ -192,13 +299,13 @@ def generate_dashboard(csv_path: str):
 
     with right:
         st.subheader("Review Count: Positive vs Negative")
-        counts = fdf[fdf["polarity"].isin(["Positive", "Negative"])]
-        data = counts.groupby([bank_col, "polarity"]).size().reset_index(name="count")
+        counts = fcells[fcells["polarity"].isin(["Positive", "Negative"])]
+        data = counts.groupby(["bank", "polarity"])["count"].sum().reset_index(name="count")
         chart = alt.Chart(data).mark_bar().encode(
-            x=alt.X(f"{bank_col}:N", title="Bank", axis=alt.Axis(labelAngle=0)),
+            x=alt.X("bank:N", title="Bank", axis=alt.Axis(labelAngle=0)),
             y=alt.Y("count:Q", title="Review Count"),
             color=alt.Color("polarity:N", scale=alt.Scale(domain=["Positive", "Negative"], range=["#90ee90", "#ff9999"])),
-            tooltip=[bank_col, "polarity", "count"]
+            tooltip=["bank", "polarity", "count"]
         ).properties(height=320)
         st.altair_chart(chart, use_container_width=True)
 
@@ -206,11 +313,7 @@ def generate_dashboard(csv_path: str):
     t1, t2 = st.columns(2)
     with t1:
         st.subheader("Top Bigrams")
-        vectorizer = CountVectorizer(ngram_range=(2, 2), stop_words='english', max_features=20)
-        bigrams = vectorizer.fit_transform(fdf[text_col].dropna().astype(str))
-        sum_words = bigrams.sum(axis=0)
-        words_freq = [(word, sum_words[0, idx]) for word, idx in vectorizer.vocabulary_.items()]
-        kw_df = pd.DataFrame(words_freq, columns=['Bigram', 'Count']).sort_values(by="Count", ascending=False)
+        kw_df = top_bigrams(cube, selected_banks, selected_sources, rating_range, n=20, deduplicated=deduplicated)
         st.dataframe(kw_df.reset_index(drop=True), use_container_width=True)
 
     with t2:
@@ -221,20 +324,72 @@ def generate_dashboard(csv_path: str):
             2: "Positive Feedback",
             3: "Highly Positive / Praise"
         }
-        fdf[cluster_col] = fdf[cluster_col].astype(int)
-        fdf["cluster"] = fdf[cluster_col].map(cluster_labels)
-        clus = fdf.groupby([bank_col, "cluster"]).size().reset_index(name="count")
+        clus = fcells.groupby(["bank", "cluster"])["count"].sum().reset_index(name="count")
+        # With n_clusters="auto" there can be more clusters than named ones
+        clus["cluster"] = clus["cluster"].map(lambda k: cluster_labels.get(k, f"Cluster {k}"))
         chart = alt.Chart(clus).mark_bar().encode(
-            x=alt.X(f"{bank_col}:N", title="Bank", axis=alt.Axis(labelAngle=0)),
+            x=alt.X("bank:N", title="Bank", axis=alt.Axis(labelAngle=0)),
             y="count:Q",
             color="cluster:N",
-            tooltip=[bank_col, "cluster", "count"]
+            tooltip=["bank", "cluster", "count"]
         ).properties(height=320)
         st.altair_chart(chart, use_container_width=True)
 
+    # --- CSAT Trend ---
+    st.markdown("---")
+    st.subheader("CSAT Trend")
+    trends_path = _trends_path(data_path)
+    if trends_path is None:
+        st.info("No trend data yet: daily and weekly aggregates are kept from review dates as reviews are analyzed.")
+    else:
+        g1, g2, g3 = st.columns([2, 3, 3])
+        with g1:
+            granularity = "week" if st.radio("Buckets", ["Daily", "Weekly"], horizontal=True) == "Weekly" else "day"
+        with g2:
+            metric = st.selectbox("Metric", list(TREND_METRICS))
+        with g3:
+            window = st.slider("Rolling window (buckets)", min_value=1, max_value=12, value=1)
+        # Pre-aggregated buckets summed in SQLite; cheap enough to read on every rerun
+        trends = read_trends(granularity, banks=selected_banks, sources=selected_sources,
+                             deduplicated=deduplicated, db_path=trends_path)
+        trends = rolling_trends(trends, window, granularity)
+        if trends.empty:
+            st.info("No dated reviews for these banks and sources.")
+        else:
+            column, fmt = TREND_METRICS[metric]
+            chart = alt.Chart(trends).mark_line(point=len(trends) < 200).encode(
+                x=alt.X("bucket_start:T", title="Week" if granularity == "week" else "Day"),
+                y=alt.Y(f"{column}:Q", title=metric),
+                color=alt.Color("bank:N", title="Bank"),
+                tooltip=["bank", alt.Tooltip("bucket_start:T", title="From"),
+                         alt.Tooltip(f"{column}:Q", title=metric, format=fmt),
+                         alt.Tooltip("review_count:Q", title="Reviews", format=",")]
+            ).properties(height=320)
+            st.altair_chart(chart, use_container_width=True)
+            st.caption("Trends follow the bank, source and count filters; the rating range does not apply.")
+
     # --- Review Table ---
     st.markdown("---")
     st.subheader("Review Samples")
+    s1, s2 = st.columns([4, 1])
+    with s1:
+        query = st.text_input("Search reviews", placeholder='e.g. OTP login, "not able to", تحديث')
+    with s2:
+        page = st.number_input("Page", min_value=1, value=1, step=1)
+
+    # Indexed datasets are searched and paged inside SQLite, so only the visible page is loaded
+    index_path = _index_path(data_path)
+    if index_path:
+        matches, page_df = search_reviews(
+            query, selected_banks, selected_sources, rating_range,
+            page=int(page), page_size=REVIEW_PAGE_SIZE, deduplicated=deduplicated, db_path=index_path
+        )
+    else:
+        matches, page_df = _search_frame(data_path, version, query, selected_banks, selected_sources, rating_range,
+                                         int(page), deduplicated)
+    st.caption(f"{matches:,} matching reviews · page {int(page)} of {max(1, math.ceil(matches / REVIEW_PAGE_SIZE))}")
+
+    fdf, bank_col, text_col, sent_col, cluster_col, keyword_col, rating_col, src_col = _prep(page_df)
     cols = [bank_col, src_col, rating_col, sent_col, keyword_col, text_col, cluster_col]
     preview = fdf[cols].rename(columns={
         bank_col: "Bank",
@@ -245,8 +400,9 @@ def generate_dashboard(csv_path: str):
         text_col: "Review Text",
         cluster_col: "Cluster"
     })
-    st.dataframe(preview.head(200), use_container_width=True)
+    st.dataframe(preview, use_container_width=True)
 
 # Entry point
 if __name__ == "__main__":
-    generate_dashboard("ai_ml_output_20250818_143840.csv")
+    # streamlit run tools/csat_dashboard.py -- <analysis dataset dir or CSV>
+    generate_dashboard(sys.argv[1] if len(sys.argv) > 1 else os.path.join("outputs", "dataset", "analysis"))